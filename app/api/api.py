@@ -1,22 +1,121 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import asyncio
+import hashlib
 import os
-import tempfile
+import zipfile
 from bson import ObjectId
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
 
-from app.ingest.ingest import ingest_pdf
+from app.classify import fast_classifier
+from app.inference import result_cache, scheduler, warmup, workers
+from app.ingest import jobs, dedup, ocr, page_cache, pages
+from app.ingest.ingest import CLASSIFY_BATCH_SIZE, ensure_tables, ingest_pdfs
 from app.db.mongo import get_db
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load once up front so the first upload does not pay for it
+    if warmup.PRELOAD_MODELS:
+        warmup.preload_in_background()
+    elif os.getenv("DOCINTEL_AI", "1") != "0":
+        try:
+            fast_classifier.load_model()
+        except Exception as e:
+            print(f"[startup] fast classifier not loaded: {e}")
+    # Jobs of processes that died were lost with their in-memory queue; the heartbeat
+    # thread fails them (and only them) now and periodically
+    jobs.start_heartbeat()
+    yield
+    jobs.shutdown(wait=False)
+    pages.shutdown()
+    ocr.shutdown()
+    workers.shutdown()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Alternative Investments Document Intelligence API",
     description="API for processing and extracting data from investment documents",
     version="1.0.0"
 )
 
+# Uploads are streamed to disk in chunks of this size while being hashed
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("DOCINTEL_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("DOCINTEL_MAX_BATCH_UPLOAD_MB", "500")) * 1024 * 1024
+MAX_BATCH_FILES = int(os.getenv("DOCINTEL_MAX_BATCH_FILES", "200"))
+# How many documents of one batch upload are ingested at the same time
+BATCH_PARALLELISM = int(os.getenv("DOCINTEL_BATCH_PARALLELISM", "4"))
+
+class UploadTooLargeError(Exception):
+    pass
+
+class BatchTooLargeError(Exception):
+    pass
+
+class UploadSizeLimitMiddleware:
+    """
+    Enforce the upload limits on the request body as it is received, so oversize
+    uploads are refused before Starlette spools them. A declared Content-Length over
+    the limit is rejected up front; chunked bodies are counted and cut off with 413
+    as soon as they pass it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/upload"):
+            await self.app(scope, receive, send)
+            return
+        limit = MAX_BATCH_UPLOAD_BYTES if scope["path"].startswith("/upload/batch") else MAX_UPLOAD_BYTES
+        reject = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds the {limit // (1024 * 1024)} MB limit"},
+        )
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLargeError(f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Whatever the app answers after the body was cut off is replaced by the 413
+            if exceeded:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await reject(scope, receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # CORS for local frontend
 app.add_middleware(
     CORSMiddleware,
@@ -39,10 +138,36 @@ class DocumentListResponse(BaseModel):
     doc_type: str
     ingest_ts: datetime
 
+class TablesResponse(BaseModel):
+    id: str
+    tables: List[List[List[Optional[str]]]]
+
 class UploadResponse(BaseModel):
-    document_id: str
+    job_id: str
+    status_url: str
     message: str
 
+class BatchItemResult(BaseModel):
+    filename: str
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+class JobResponse(BaseModel):
+    id: str
+    filename: str
+    state: str
+    created_ts: datetime
+    updated_ts: datetime
+    timings: Dict[str, float]
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -51,49 +176,252 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "upload": "/upload",
+            "upload_batch": "/upload/batch",
+            "job": "/jobs/{job_id}",
             "document": "/document/{document_id}",
+            "tables": "/document/{document_id}/tables",
             "documents": "/documents",
+            "metrics": "/metrics",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "docs": "/docs"
         }
     }
 
-@app.post("/upload", response_model=UploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+@app.post("/upload", response_model=UploadResponse, status_code=202)
+async def upload_document(
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Reprocess even if identical content was already ingested")
+):
     """
     Upload a PDF document for processing and extraction.
     
     - **file**: PDF file to upload and process
-    - Returns the inserted document ID
+    - **force**: Reprocess the file even if a document with the same content hash exists
+    - Returns a job ID immediately; poll /jobs/{job_id} for progress and the document ID
     """
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    tmp_path = None
+    file_path = jobs.new_upload_path()
     try:
-        # Write the uploaded file content to a closed temp file (Windows requires closed handle)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file.flush()
-            tmp_path = temp_file.name
+        # Persist the upload so a worker can pick it up after we respond
+        content_hash = await _save_upload(file, file_path)
 
-        # Now that the file handle is closed, process the document
-        document_id = ingest_pdf(tmp_path, original_filename=file.filename)
+        job_id = jobs.enqueue_ingest(
+            file_path, original_filename=file.filename, force=force, content_hash=content_hash
+        )
 
         return UploadResponse(
-            document_id=document_id,
-            message=f"Document '{file.filename}' processed successfully"
+            job_id=job_id,
+            status_url=f"/jobs/{job_id}",
+            message=f"Document '{file.filename}' queued for processing"
         )
+    except UploadTooLargeError as e:
+        _remove_file(file_path)
+        raise HTTPException(status_code=413, detail=str(e))
+    except jobs.QueueFullError as e:
+        _remove_file(file_path)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
-    finally:
-        # Ensure temp file is removed, ignoring errors if already deleted or locked
-        if tmp_path and os.path.exists(tmp_path):
+        _remove_file(file_path)
+        raise HTTPException(status_code=500, detail=f"Error queueing document: {str(e)}")
+
+async def _save_upload(file: UploadFile, path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    Stream an upload to disk in fixed-size chunks, computing its SHA-256 on the way.
+    Raises UploadTooLargeError as soon as max_bytes is exceeded.
+    """
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(
+                    f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit"
+                )
+            h.update(chunk)
+            f.write(chunk)
+    return h.hexdigest()
+
+def _extract_zip_pdfs(zip_path: str, zip_name: str, max_files: int, max_bytes: int) -> tuple:
+    """
+    Copy every PDF member of a zip archive into the upload directory.
+    Returns ([(filename, path_or_None, content_hash_or_None, error_or_None), ...], bytes_extracted).
+    Raises BatchTooLargeError once the archive holds more than max_files PDFs or
+    decompresses to more than max_bytes; files extracted so far are removed on any error.
+    """
+    items = []
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                    continue
+                if len(items) >= max_files:
+                    raise BatchTooLargeError(f"Batch contains more than {MAX_BATCH_FILES} files")
+                filename = f"{zip_name}/{info.filename}"
+                if info.file_size > MAX_UPLOAD_BYTES:
+                    items.append((filename, None, None, f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"))
+                    continue
+                if total + info.file_size > max_bytes:
+                    raise BatchTooLargeError(_batch_bytes_error())
+                path = jobs.new_upload_path()
+                # Registered before writing so a partial file is cleaned up too
+                items.append((filename, path, None, None))
+                h = hashlib.sha256()
+                size = 0
+                # Enforce the limits on what is actually decompressed, not the declared size
+                with zf.open(info) as src, open(path, "wb") as dst:
+                    for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+                        size += len(chunk)
+                        if size > MAX_UPLOAD_BYTES:
+                            break
+                        if total + size > max_bytes:
+                            raise BatchTooLargeError(_batch_bytes_error())
+                        h.update(chunk)
+                        dst.write(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    _remove_file(path)
+                    items[-1] = (filename, None, None, f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+                    continue
+                total += size
+                items[-1] = (filename, path, h.hexdigest(), None)
+    except BaseException:
+        for _, path, _, _ in items:
+            _remove_file(path)
+        raise
+    return items, total
+
+def _batch_bytes_error() -> str:
+    return f"Batch exceeds the {MAX_BATCH_UPLOAD_BYTES // (1024 * 1024)} MB limit once decompressed"
+
+@app.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    force: bool = Query(False, description="Reprocess even if identical content was already ingested")
+):
+    """
+    Upload many PDF documents (or zip archives of PDFs) and process them together.
+    
+    - **files**: PDF files and/or .zip archives containing PDFs
+    - **force**: Reprocess files even if a document with the same content hash exists
+    - Documents are ingested concurrently (DOCINTEL_BATCH_PARALLELISM groups of
+      DOCINTEL_CLASSIFY_BATCH_SIZE at a time); returns a document ID or an error for every file
+    """
+    # (filename, path, content_hash, error) for every PDF in the batch
+    items = []
+    # Uncompressed bytes taken out of zip archives so far
+    extracted_bytes = 0
+    try:
+        for file in files:
+            name = file.filename or "upload"
+            lowered = name.lower()
+            if not (lowered.endswith(".pdf") or lowered.endswith(".zip")):
+                items.append((name, None, None, "Only PDF files or zip archives of PDFs are supported"))
+            elif lowered.endswith(".pdf"):
+                path = jobs.new_upload_path(".pdf")
+                try:
+                    items.append((name, path, await _save_upload(file, path), None))
+                except UploadTooLargeError as e:
+                    _remove_file(path)
+                    items.append((name, None, None, str(e)))
+            else:
+                # Archives may be as large as the whole batch
+                path = jobs.new_upload_path(".zip")
+                try:
+                    await _save_upload(file, path, max_bytes=MAX_BATCH_UPLOAD_BYTES)
+                    extracted, size = await run_in_threadpool(
+                        _extract_zip_pdfs, path, name,
+                        MAX_BATCH_FILES - len(items), MAX_BATCH_UPLOAD_BYTES - extracted_bytes,
+                    )
+                    items.extend(extracted)
+                    extracted_bytes += size
+                except UploadTooLargeError as e:
+                    items.append((name, None, None, str(e)))
+                except zipfile.BadZipFile:
+                    items.append((name, None, None, "Invalid zip archive"))
+                finally:
+                    _remove_file(path)
+            if len(items) > MAX_BATCH_FILES:
+                raise BatchTooLargeError(f"Batch contains more than {MAX_BATCH_FILES} files")
+    except BaseException as e:
+        for _, path, _, _ in items:
+            _remove_file(path)
+        if isinstance(e, BatchTooLargeError):
+            raise HTTPException(status_code=413, detail=str(e))
+        raise
+
+    # Valid PDFs are ingested in groups, up to BATCH_PARALLELISM groups at a time;
+    # each group is classified with one batched model call
+    semaphore = asyncio.Semaphore(max(1, BATCH_PARALLELISM))
+    valid = [item for item in items if not item[3]]
+    groups = [valid[i:i + CLASSIFY_BATCH_SIZE] for i in range(0, len(valid), CLASSIFY_BATCH_SIZE)]
+
+    async def _ingest(group) -> dict:
+        async with semaphore:
             try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
+                outcomes = await run_in_threadpool(
+                    ingest_pdfs, [(path, name, h) for name, path, h, _ in group], force=force
+                )
+            except Exception as e:
+                outcomes = [(None, str(e))] * len(group)
+        return {path: outcome for (_, path, _, _), outcome in zip(group, outcomes)}
+
+    outcomes = {}
+    for group_outcomes in await asyncio.gather(*(_ingest(group) for group in groups)):
+        outcomes.update(group_outcomes)
+
+    results = []
+    for filename, path, _, error in items:
+        if not error:
+            document_id, error = outcomes[path]
+            if error:
+                # No document refers to the upload of a failed item
+                _remove_file(path)
+                error = f"Error processing document: {error}"
+        else:
+            document_id = None
+        results.append(BatchItemResult(filename=filename, document_id=document_id, error=error))
+    failed = sum(1 for r in results if r.error)
+    return BatchUploadResponse(
+        total=len(results),
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results,
+    )
+
+def _remove_file(path: str):
+    # Ignore errors if already deleted or locked
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except Exception:
+            pass
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Retrieve the status of an ingestion job.
+    
+    - **job_id**: The ID returned by /upload
+    - Returns the job state (queued/parsing/classifying/extracting/done/failed),
+      per-stage timings in seconds and, once done, the document ID
+    """
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+    try:
+        job = jobs.get_job(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving job: {str(e)}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job)
 
 @app.get("/document/{document_id}", response_model=DocumentResponse)
 async def get_document(document_id: str):
@@ -126,6 +454,27 @@ async def get_document(document_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving document: {str(e)}")
 
+@app.get("/document/{document_id}/tables", response_model=TablesResponse)
+async def get_document_tables(document_id: str):
+    """
+    Retrieve the tables of a document.
+    
+    - **document_id**: The MongoDB ObjectId of the document
+    - Tables are extracted from the original PDF on first request and cached
+    """
+    if not ObjectId.is_valid(document_id):
+        raise HTTPException(status_code=400, detail="Invalid document ID format")
+    try:
+        # Table detection is slow; keep it off the event loop
+        tables = await run_in_threadpool(ensure_tables, document_id)
+        return TablesResponse(id=document_id, tables=tables)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error extracting tables: {str(e)}")
+
 @app.get("/documents", response_model=List[DocumentListResponse])
 async def list_documents(
     limit: Optional[int] = 100,
@@ -175,6 +524,19 @@ async def list_documents(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    """Processing counters for this API process"""
+    return {
+        "dedup": dedup.stats(),
+        "page_cache": page_cache.stats(),
+        "fast_classifier": fast_classifier.stats(),
+        "result_cache": result_cache.stats(),
+        "scheduler": scheduler.stats(),
+        "inference_workers": workers.stats(),
+        "pending_jobs": jobs.pending_jobs(),
+    }
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -186,6 +548,24 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness: the process is up and serving requests (no dependency checks)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: database reachable and models loaded (503 until then)"""
+    try:
+        await run_in_threadpool(get_db().command, "ping")
+        database = "connected"
+    except Exception as e:
+        database = f"unavailable: {e}"
+    models = warmup.status()
+    ready = database == "connected" and warmup.models_ready()
+    body = {"status": "ready" if ready else "not_ready", "database": database, "models": models}
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,8 +1,11 @@
 from __future__ import annotations
-from transformers import pipeline
 import threading
 import re
 
+from app.inference import backends, result_cache, scheduler, workers
+from app.inference.backends import build_pipeline
+from app.inference.tiers import model_for
+
 # Simplified labels that match common document language
 _LABELS = [
     ("capital_call_letter", "capital call notice"),
@@ -12,8 +15,10 @@ _LABELS = [
 ]
 
 _HYPOTHESIS = "This document is a {}."
-# _MODEL_NAME = "typeform/distilbert-base-uncased-mnli"
-_MODEL_NAME = "facebook/bart-large-mnli"
+# facebook/bart-large-mnli unless another tier/model is configured (see app/inference/tiers.py)
+_MODEL_NAME = model_for("classifier")
+# Only the start of the cleaned text is classified (leaves room for model processing)
+MAX_INPUT_CHARS = 1500
 
 _pipe = None
 _lock = threading.Lock()
@@ -23,11 +28,7 @@ def _get_pipe():
     if _pipe is None:
         with _lock:
             if _pipe is None:
-                _pipe = pipeline(
-                    task="zero-shot-classification",
-                    model=_MODEL_NAME,
-                    device=-1
-                )
+                _pipe = build_pipeline("zero-shot-classification", _MODEL_NAME)
     return _pipe
 
 def clean_text_for_ai(text: str) -> str:
@@ -38,35 +39,17 @@ def clean_text_for_ai(text: str) -> str:
     text = re.sub(r'[^\w\s.,;:!?()-]', ' ', text)
     return text.strip()
 
-def classify_text_ai(text: str, threshold: float = 0.55):
-    
-    # Return (label_key, best_score, score_dict) using zero-shot classification.
-    # If best_score < threshold, returns ('unknown', best_score, scores).
-    
-    if not text or not text.strip():
-        return "unknown", 0.0, {}
-    
+def _prepare_text(text: str) -> str:
     # Clean and truncate text for better results
     cleaned_text = clean_text_for_ai(text)
     
-    # Take first 1500 chars (leaves room for model processing)
-    if len(cleaned_text) > 1500:
-        cleaned_text = cleaned_text[:1500]
-    
-    pipe = _get_pipe()
+    # Take first MAX_INPUT_CHARS chars (leaves room for model processing)
+    if len(cleaned_text) > MAX_INPUT_CHARS:
+        cleaned_text = cleaned_text[:MAX_INPUT_CHARS]
+    return cleaned_text
 
+def _to_result(result: dict, threshold: float, label_thresholds: dict = None):
     candidate_texts = [desc for _, desc in _LABELS]
-    
-    try:
-        result = pipe(
-            cleaned_text,
-            candidate_labels=candidate_texts,
-            hypothesis_template=_HYPOTHESIS,
-            multi_label=False,
-        )
-    except Exception as e:
-        print(f"AI classification failed: {e}")
-        return "unknown", 0.0, {}
 
     # Convert result back to keys
     scores = {}
@@ -78,6 +61,96 @@ def classify_text_ai(text: str, threshold: float = 0.55):
     best_key = max(scores, key=scores.get)
     best_score = scores[best_key]
     
-    if best_score < threshold:
+    if best_score < (label_thresholds or {}).get(best_key, threshold):
         return "unknown", best_score, scores
-    return best_key, best_score, scores
\ No newline at end of file
+    return best_key, best_score, scores
+
+def classify_text_ai(text: str, threshold: float = 0.55, label_thresholds: dict = None):
+    
+    # Return (label_key, best_score, score_dict) using zero-shot classification.
+    # If best_score < threshold, returns ('unknown', best_score, scores).
+    # label_thresholds ({label_key: threshold}) overrides threshold for those labels.
+    
+    return classify_texts_ai([text], threshold=threshold, batch_size=1, label_thresholds=label_thresholds)[0]
+
+def classify_texts_ai(texts: list, threshold: float = 0.55, batch_size: int = 8,
+                      label_thresholds: dict = None) -> list:
+    
+    # Batched classify_text_ai: one (label_key, best_score, score_dict) per text, in order.
+    # All texts go through the pipeline in one call, batch_size premise/hypothesis
+    # pairs at a time (padded), instead of one pipeline call per document. With
+    # micro-batching on, the scheduler batches them with concurrent callers' texts, and
+    # each scheduled batch still runs batch_size pairs per forward pass.
+    
+    results = [("unknown", 0.0, {}) for _ in texts]
+    todo = [(i, _prepare_text(t)) for i, t in enumerate(texts) if t and t.strip()]
+    if not todo:
+        return results
+
+    candidate_texts = [desc for _, desc in _LABELS]
+
+    # Raw label scores are cached (not the thresholded label), so any threshold can reuse them
+    model_key = f"{_MODEL_NAME}|{backends.INFERENCE_BACKEND}"
+    prompt_key = _HYPOTHESIS + "|" + "|".join(candidate_texts)
+    misses = []
+    for i, cleaned_text in todo:
+        key = result_cache.make_key("classify", model_key, prompt_key, cleaned_text)
+        cached = result_cache.get("classify", key)
+        if cached is not None:
+            results[i] = _to_result(cached, threshold, label_thresholds)
+        else:
+            misses.append((i, cleaned_text, key))
+    if not misses:
+        return results
+
+    miss_texts = [cleaned_text for _, cleaned_text, _ in misses]
+    if scheduler.MICROBATCH_ENABLED:
+        # Batched with concurrent requests' texts by the scheduler thread
+        outputs = _classify_batcher.map([(text, batch_size) for text in miss_texts])
+    else:
+        try:
+            outputs = _classify_batch(miss_texts, batch_size=batch_size)
+        except Exception as e:
+            outputs = [e] * len(miss_texts)
+
+    failed = [r for r in outputs if isinstance(r, Exception)]
+    if failed:
+        print(f"AI classification failed: {failed[0]}")
+    for (i, _, key), result in zip(misses, outputs):
+        if isinstance(result, Exception):
+            continue
+        result_cache.put("classify", key, result)
+        results[i] = _to_result(result, threshold, label_thresholds)
+    return results
+
+def _classify_batch(texts: list, batch_size: int = 8) -> list:
+    # In an inference worker process when DOCINTEL_INFERENCE_WORKERS > 0
+    return workers.run(_run_classify_batch, texts, batch_size=batch_size)
+
+def _run_classify_batch(texts: list, batch_size: int = 8) -> list:
+    # Raw {"labels", "scores"} per prepared text, all texts through one pipeline call
+    outputs = _get_pipe()(
+        texts,
+        candidate_labels=[desc for _, desc in _LABELS],
+        hypothesis_template=_HYPOTHESIS,
+        multi_label=False,
+        batch_size=batch_size,
+    )
+    if isinstance(outputs, dict):
+        outputs = [outputs]
+    return [{"labels": list(r["labels"]), "scores": [float(s) for s in r["scores"]]} for r in outputs]
+
+def _classify_microbatch(items: list) -> list:
+    # Scheduled items are (text, batch_size); callers with different batch sizes that
+    # land in the same scheduled batch each get their own pipeline call
+    outputs = [None] * len(items)
+    by_size = {}
+    for i, (_, batch_size) in enumerate(items):
+        by_size.setdefault(batch_size, []).append(i)
+    for batch_size, idx in by_size.items():
+        for i, out in zip(idx, _classify_batch([items[i][0] for i in idx], batch_size=batch_size)):
+            outputs[i] = out
+    return outputs
+
+# One batch in flight per inference worker
+_classify_batcher = scheduler.MicroBatcher("classify", _classify_microbatch, threads=workers.INFERENCE_WORKERS or 1)
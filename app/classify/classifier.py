@@ -1,7 +1,10 @@
 # app/classify/classifier.py
+import json
 import os
-import re
-from .ai_classifier import classify_text_ai
+from pathlib import Path
+from . import ai_classifier
+from .ai_classifier import classify_text_ai, classify_texts_ai
+from .fast_classifier import classify_texts_fast
 
 DOC_TYPES = {
     "capital_call_letter": [
@@ -25,25 +28,124 @@ DOC_TYPES = {
     ],
 }
 
-def classify_text_rule(text: str) -> str:    
-    lowered = text.lower()
+# Optional per-keyword weights (default 1.0), e.g. {"capital call notice": 2.0}
+KEYWORD_WEIGHTS = {}
+# When > 0, a keyword's weight halves every this many characters into the document
+# (first occurrence counts), so matches on the first pages outweigh later ones
+RULE_DECAY_CHARS = int(os.getenv("DOCINTEL_RULE_DECAY_CHARS", "0"))
+
+_rule_matcher = None
+_rule_backend = None
+
+# Zero-shot acceptance thresholds written by `python evaluate_classifier.py --calibrate`:
+# {"threshold": 0.55, "label_thresholds": {label_key: threshold}}; 0.55 for all labels without it
+THRESHOLDS_PATH = os.getenv(
+    "DOCINTEL_THRESHOLDS_PATH",
+    str(Path(__file__).resolve().parents[2] / "models" / "classifier_thresholds.json"),
+)
+DEFAULT_THRESHOLD = 0.55
+_thresholds = None
+
+
+def load_thresholds() -> tuple:
+    """(threshold, label_thresholds) from the calibration config, read once."""
+    global _thresholds
+    if _thresholds is None:
+        config = {}
+        if os.path.exists(THRESHOLDS_PATH):
+            with open(THRESHOLDS_PATH) as f:
+                config = json.load(f)
+            if config.get("model") not in (None, ai_classifier._MODEL_NAME):
+                print(f"[classifier] thresholds in {THRESHOLDS_PATH} were calibrated for {config['model']}, "
+                      f"not {ai_classifier._MODEL_NAME}")
+        _thresholds = (config.get("threshold", DEFAULT_THRESHOLD), config.get("label_thresholds", {}))
+    return _thresholds
+
+
+def _compile_rules():
+    """
+    Build a function lowered_text -> iterator of (start, keyword) over the keywords
+    found in the text. With pyahocorasick installed every occurrence is reported in one
+    pass, overlapping ones included ("capital call notice" also yields "capital call"
+    and "call notice"); otherwise each keyword's first occurrence is found with one
+    substring scan per keyword, which is faster than any pure-Python single pass.
+    """
+    global _rule_matcher, _rule_backend
+    if _rule_matcher is None:
+        keywords = sorted({kw for kws in DOC_TYPES.values() for kw in kws})
+        try:
+            import ahocorasick
+
+            automaton = ahocorasick.Automaton()
+            for kw in keywords:
+                automaton.add_word(kw, kw)
+            automaton.make_automaton()
+
+            def matcher(lowered):
+                for end, kw in automaton.iter(lowered):
+                    yield end - len(kw) + 1, kw
+
+            _rule_backend = "aho-corasick"
+        except ImportError:
+            def matcher(lowered):
+                for kw in keywords:
+                    start = lowered.find(kw)
+                    if start >= 0:
+                        yield start, kw
+
+            _rule_backend = "per-keyword scan"
+        _rule_matcher = matcher
+    return _rule_matcher
+
+
+def rule_backend() -> str:
+    """Name of the keyword matcher the rules classifier uses ("aho-corasick" or "per-keyword scan")."""
+    _compile_rules()
+    return _rule_backend
+
+
+def classify_text_rule(text: str, weights: dict = None, decay_chars: int = None) -> str:
+    """
+    Keyword vote: each doc type scores the (weighted) keywords found in the text.
+    The text is scanned once by an Aho-Corasick matcher when pyahocorasick is installed.
+    """
+    weights = KEYWORD_WEIGHTS if weights is None else weights
+    decay_chars = RULE_DECAY_CHARS if decay_chars is None else decay_chars
+
+    first_seen = {}
+    for start, kw in _compile_rules()(text.lower()):
+        if kw not in first_seen or start < first_seen[kw]:
+            first_seen[kw] = start
+
     scores = {doc_type: 0 for doc_type in DOC_TYPES}
     for doc_type, keywords in DOC_TYPES.items():
         for kw in keywords:
-            if kw in lowered:
-                scores[doc_type] += 1
+            if kw in first_seen:
+                weight = weights.get(kw, 1.0)
+                if decay_chars > 0:
+                    weight *= 0.5 ** (first_seen[kw] / decay_chars)
+                scores[doc_type] += weight
     best_type = max(scores, key=scores.get)
     return best_type if scores[best_type] > 0 else "unknown"
 
 
 def classify_text(text: str) -> str:
     """
-    AI-first classifier with rules fallback.    
+    AI-first classifier with rules fallback. When a trained fast-tier model exists
+    (see fast_classifier.py), confident TF-IDF predictions skip the zero-shot model.
+    With DOCINTEL_AI=0 only the rules run.
     """
     use_ai = os.getenv("DOCINTEL_AI", "1") != "0"
     if use_ai:
         try:
-            label, score, scores = classify_text_ai(text, threshold=0.55)
+            label, _, _ = classify_texts_fast([text])[0]
+            if label:
+                return label
+        except Exception as e:
+            print(f"[classifier] fast tier failed, escalating to AI: {e}")
+        try:
+            threshold, label_thresholds = load_thresholds()
+            label, score, scores = classify_text_ai(text, threshold=threshold, label_thresholds=label_thresholds)
             
             if label != "unknown":
                 return label
@@ -52,3 +154,29 @@ def classify_text(text: str) -> str:
             print(f"[classifier] AI classify failed, falling back to rules: {e}")
 
     return classify_text_rule(text)
+
+
+def classify_texts(texts: list, batch_size: int = 8) -> list:
+    """
+    Batched classify_text for bulk ingestion: the fast tier answers what it can, the
+    rest go through one zero-shot pipeline call, with the rules fallback per document.
+    """
+    labels = ["unknown"] * len(texts)
+    use_ai = os.getenv("DOCINTEL_AI", "1") != "0"
+    if use_ai:
+        try:
+            labels = [label or "unknown" for label, _, _ in classify_texts_fast(texts)]
+        except Exception as e:
+            print(f"[classifier] fast tier failed, escalating to AI: {e}")
+    escalated = [i for i, label in enumerate(labels) if label == "unknown"]
+    if use_ai and escalated:
+        try:
+            threshold, label_thresholds = load_thresholds()
+            results = classify_texts_ai([texts[i] for i in escalated], threshold=threshold,
+                                        batch_size=batch_size, label_thresholds=label_thresholds)
+            for i, (label, _, _) in zip(escalated, results):
+                labels[i] = label
+        except Exception as e:
+            print(f"[classifier] AI classify failed, falling back to rules: {e}")
+
+    return [label if label != "unknown" else classify_text_rule(text) for label, text in zip(labels, texts)]
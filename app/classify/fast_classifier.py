@@ -0,0 +1,255 @@
+# app/classify/fast_classifier.py
+# Fast classification tier: TF-IDF + logistic regression trained on data/provided_dataset.
+# Confident predictions (top-1 minus top-2 probability >= DOCINTEL_FAST_MARGIN) are
+# answered here; low-margin documents escalate to the zero-shot model.
+#
+#   python -m app.classify.fast_classifier train      # fit and save the model
+#   python -m app.classify.fast_classifier evaluate   # cross-validated accuracy + escalation rate
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .ai_classifier import _LABELS
+
+DATASET_DIR = "data/provided_dataset"
+MODEL_PATH = os.getenv(
+    "DOCINTEL_FAST_MODEL_PATH",
+    str(Path(__file__).resolve().parents[2] / "models" / "fast_classifier.joblib"),
+)
+FAST_TIER_ENABLED = os.getenv("DOCINTEL_FAST_TIER", "1") != "0"
+FAST_MARGIN = float(os.getenv("DOCINTEL_FAST_MARGIN", "0.3"))
+# Leading characters used as features; keeps per-document latency flat on long reports
+MAX_INPUT_CHARS = 5000
+
+_model = None
+_model_loaded = False
+_lock = threading.Lock()
+_stats = {"answered": 0, "escalated": 0}
+_stats_lock = threading.Lock()
+
+
+def label_for_folder(folder: str):
+    """Map a dataset folder name ("quarterly update letter") to a label key ("quarterly_update")."""
+    normalized = folder.lower().replace(" ", "_")
+    for key, _ in _LABELS:
+        if normalized == key or normalized.startswith(key):
+            return key
+    return None
+
+
+def iter_dataset(dataset_dir: str = DATASET_DIR):
+    """Yield (file_path, label) for every PDF in a dataset organized as <label folder>/<file>.pdf."""
+    for folder in sorted(os.listdir(dataset_dir)):
+        folder_path = os.path.join(dataset_dir, folder)
+        label = label_for_folder(folder)
+        if not os.path.isdir(folder_path) or label is None:
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            if filename.lower().endswith(".pdf"):
+                yield os.path.join(folder_path, filename), label
+
+
+def _prepare(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "")[:MAX_INPUT_CHARS].lower()
+
+
+def build_model():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    return make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1, max_features=50000),
+        LogisticRegression(max_iter=2000, C=10.0),
+    )
+
+
+def load_model(path: str = MODEL_PATH):
+    """
+    Load the saved model once (called at API startup); None if it has not been trained
+    or cannot be loaded (sklearn missing, version mismatch, corrupt file), in which
+    case every document escalates.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _lock:
+            if not _model_loaded:
+                if os.path.exists(path):
+                    try:
+                        import joblib
+                        _model = joblib.load(path)
+                    except Exception as e:
+                        print(f"[fast_classifier] could not load {path}, escalating every document: {e}")
+                _model_loaded = True
+    return _model
+
+
+def classify_texts_fast(texts: list, margin: float = FAST_MARGIN) -> list:
+    """
+    Return (label_or_None, margin, probs) per text; label is None when the model is
+    missing/disabled or the margin is below the escalation threshold.
+    """
+    model = load_model() if FAST_TIER_ENABLED else None
+    if model is None or not texts:
+        return [(None, 0.0, {}) for _ in texts]
+
+    probs = model.predict_proba([_prepare(t) for t in texts])
+    classes = [str(c) for c in model.classes_]
+    results = []
+    for row in probs:
+        ranked = sorted(zip(classes, row), key=lambda kv: kv[1], reverse=True)
+        top_margin = float(ranked[0][1] - (ranked[1][1] if len(ranked) > 1 else 0.0))
+        label = ranked[0][0] if top_margin >= margin else None
+        results.append((label, top_margin, {c: float(p) for c, p in zip(classes, row)}))
+
+    answered = sum(1 for label, _, _ in results if label)
+    with _stats_lock:
+        _stats["answered"] += answered
+        _stats["escalated"] += len(results) - answered
+    return results
+
+
+def classify_text_fast(text: str, margin: float = FAST_MARGIN):
+    return classify_texts_fast([text], margin=margin)[0]
+
+
+def stats() -> dict:
+    with _stats_lock:
+        answered, escalated = _stats["answered"], _stats["escalated"]
+    total = answered + escalated
+    return {
+        "model_loaded": _model is not None,
+        "answered": answered,
+        "escalated": escalated,
+        "escalation_rate": round(escalated / total, 4) if total else 0.0,
+    }
+
+
+def _load_dataset(dataset_dir: str):
+    from app.ingest.pages import extract_text
+
+    paths, texts, labels = [], [], []
+    for path, label in iter_dataset(dataset_dir):
+        paths.append(path)
+        texts.append(_prepare(extract_text(path)))
+        labels.append(label)
+    return paths, texts, labels
+
+
+def train(dataset_dir: str = DATASET_DIR, out_path: str = MODEL_PATH):
+    import joblib
+
+    _, texts, labels = _load_dataset(dataset_dir)
+    model = build_model()
+    model.fit(texts, labels)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    joblib.dump(model, out_path)
+    print(f"Trained on {len(texts)} documents ({len(set(labels))} labels); saved to {out_path}")
+
+
+def cross_val_predict(texts: list, labels: list, folds: int = 3):
+    """
+    Out-of-fold predictions: every document is predicted by a model that was not trained
+    on it (stratified k-fold). Returns (top labels, top-two margins, per-document
+    predict latencies in seconds), in input order.
+    """
+    import numpy as np
+    from sklearn.model_selection import StratifiedKFold
+
+    texts = [_prepare(t) for t in texts]
+    labels_arr = np.array(labels)
+    min_class = min(labels.count(label) for label in set(labels))
+    splitter = StratifiedKFold(n_splits=max(2, min(folds, min_class)), shuffle=True, random_state=0)
+
+    predicted = [None] * len(texts)
+    margins = [0.0] * len(texts)
+    latencies = []
+    for train_idx, test_idx in splitter.split(texts, labels_arr):
+        model = build_model()
+        model.fit([texts[i] for i in train_idx], labels_arr[train_idx])
+        classes = [str(c) for c in model.classes_]
+        for i in test_idx:
+            t0 = time.perf_counter()
+            row = model.predict_proba([texts[i]])[0]
+            latencies.append(time.perf_counter() - t0)
+            ranked = sorted(zip(classes, row), key=lambda kv: kv[1], reverse=True)
+            margins[i] = float(ranked[0][1] - (ranked[1][1] if len(ranked) > 1 else 0.0))
+            predicted[i] = ranked[0][0]
+    return predicted, margins, latencies
+
+
+def evaluate(dataset_dir: str = DATASET_DIR, margin: float = FAST_MARGIN, folds: int = 3,
+             with_ai: bool = False, json_path: str = None) -> dict:
+    """
+    Stratified k-fold report: fast-tier accuracy on the documents it answers, escalation
+    rate, and (with_ai=True) accuracy of the full cascade with escalations sent to
+    the zero-shot model + rules fallback.
+    """
+    import numpy as np
+
+    paths, texts, labels = _load_dataset(dataset_dir)
+    predicted, margins, latencies = cross_val_predict(texts, labels, folds=folds)
+
+    answered = [i for i in range(len(texts)) if margins[i] >= margin]
+    report = {
+        "documents": len(texts),
+        "margin": margin,
+        "fast_accuracy_all": round(float(np.mean([predicted[i] == labels[i] for i in range(len(texts))])), 4),
+        "answered": len(answered),
+        "fast_accuracy_answered": round(float(np.mean([predicted[i] == labels[i] for i in answered])), 4) if answered else None,
+        "escalation_rate": round(1 - len(answered) / len(texts), 4),
+        "median_latency_ms": round(float(np.median(latencies)) * 1000, 3),
+    }
+
+    if with_ai:
+        from app.ingest.pages import extract_text
+        from .classifier import classify_text_ai, classify_text_rule
+
+        correct = 0
+        for i, path in enumerate(paths):
+            if margins[i] >= margin:
+                label = predicted[i]
+            else:
+                full_text = extract_text(path)
+                label, _, _ = classify_text_ai(full_text)
+                if label == "unknown":
+                    label = classify_text_rule(full_text)
+            correct += label == labels[i]
+        report["cascade_accuracy"] = round(correct / len(paths), 4)
+
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or evaluate the TF-IDF fast classification tier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_train = sub.add_parser("train", help="Fit on the dataset and save the model")
+    p_train.add_argument("--dataset", default=DATASET_DIR)
+    p_train.add_argument("--out", default=MODEL_PATH)
+    p_eval = sub.add_parser("evaluate", help="Cross-validated accuracy and escalation rate")
+    p_eval.add_argument("--dataset", default=DATASET_DIR)
+    p_eval.add_argument("--margin", type=float, default=FAST_MARGIN)
+    p_eval.add_argument("--folds", type=int, default=3)
+    p_eval.add_argument("--with-ai", action="store_true", help="Also score the full cascade with the zero-shot model")
+    p_eval.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        train(args.dataset, args.out)
+    else:
+        evaluate(args.dataset, margin=args.margin, folds=args.folds, with_ai=args.with_ai, json_path=args.json_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,31 @@
-from pymongo import MongoClient
 import os
+import threading
 
 # later move this to environment variables
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "doc_intel")
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+# The client is created on first use, not at import, so importing the API or a CLI
+# tool does not start pymongo's background monitor threads
+_client = None
+_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from pymongo import MongoClient
+                _client = MongoClient(MONGO_URI)
+    return _client
 
 def get_db():
-    return db
+    return get_client()[DB_NAME]
+
+def close_client():
+    """Close the shared client, e.g. before forking worker processes; get_db() opens a new one."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
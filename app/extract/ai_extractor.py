@@ -1,11 +1,31 @@
 import threading
 import re
 import os
-from transformers import pipeline
+import time
 from decimal import Decimal, InvalidOperation
 
-_MODEL_QA = "deepset/roberta-large-squad2"  # SQuAD-style QA model
+from app.extract.passages import PassageIndex
+from app.inference import backends, result_cache, scheduler, workers
+from app.inference.backends import build_pipeline
+from app.inference.qa_context import answer_groups
+from app.inference.tiers import model_for
+
+_MODEL_QA = model_for("qa")  # SQuAD-style QA model; deepset/roberta-large-squad2 by default
+# Without retrieval, QA runs over the first CONTEXT_CHARS cleaned characters of a document
+CONTEXT_CHARS = 4000
+# With retrieval, each question reads the QA_TOP_K passages of the whole document that best
+# match it (BM25), within QA_TOKEN_BUDGET context tokens
+QA_RETRIEVAL = os.getenv("DOCINTEL_QA_RETRIEVAL", "1") != "0"
+QA_TOP_K = int(os.getenv("DOCINTEL_QA_TOP_K", "3"))
+QA_TOKEN_BUDGET = int(os.getenv("DOCINTEL_QA_TOKEN_BUDGET", "320"))
+# Upper bound on the text indexed per document
+MAX_DOCUMENT_CHARS = 200_000
+# Question/context pairs per forward pass when a document's questions are batched
+QA_BATCH_SIZE = int(os.getenv("DOCINTEL_QA_BATCH_SIZE", "8"))
+# Tokenize and window the context once per document and reuse it for every question
+QA_SHARED_CONTEXT = os.getenv("DOCINTEL_QA_SHARED_CONTEXT", "1") != "0"
 _pipe_qa = None
+_tokenizer_qa = None
 _lock = threading.Lock()
 
 def _get_qa_pipe():
@@ -13,10 +33,154 @@ def _get_qa_pipe():
     if _pipe_qa is None:
         with _lock:
             if _pipe_qa is None:
-                _pipe_qa = pipeline("question-answering", model=_MODEL_QA, device=-1)
+                _pipe_qa = build_pipeline("question-answering", _MODEL_QA)
     return _pipe_qa
 
-def _clean_text(text: str, max_chars: int = 4000) -> str:
+def _qa_token_counter():
+    """
+    Token counting for retrieval budgets. With inference workers the model lives in the
+    worker processes, so only the standalone `tokenizers` file is loaded here (importing
+    transformers would pull torch into the API process); None falls back to an estimate.
+    """
+    global _tokenizer_qa
+    if not workers.enabled():
+        tokenizer = _get_qa_pipe().tokenizer
+        return lambda p: len(tokenizer(p, add_special_tokens=False)["input_ids"])
+    if _tokenizer_qa is None:
+        with _lock:
+            if _tokenizer_qa is None:
+                try:
+                    from tokenizers import Tokenizer
+
+                    if os.path.isdir(_MODEL_QA):
+                        path = os.path.join(_MODEL_QA, "tokenizer.json")
+                    else:
+                        from huggingface_hub import hf_hub_download
+                        path = hf_hub_download(_MODEL_QA, "tokenizer.json")
+                    _tokenizer_qa = Tokenizer.from_file(path)
+                except Exception as e:
+                    print(f"[ai_extractor] No tokenizer.json for {_MODEL_QA}, estimating token counts: {e}")
+                    _tokenizer_qa = False
+    if not _tokenizer_qa:
+        return None
+    tokenizer = _tokenizer_qa
+    return lambda p: len(tokenizer.encode(p, add_special_tokens=False).ids)
+
+def _qa_batch(pairs: list) -> list:
+    # In an inference worker process when DOCINTEL_INFERENCE_WORKERS > 0
+    return workers.run(_run_qa_batch, pairs)
+
+def _run_qa_batch(pairs: list) -> list:
+    """
+    Answer (question, context) pairs, possibly from several concurrent documents. With a
+    fast tokenizer each distinct context is encoded once for all of its questions.
+    Returns one (answer, stats) per pair, or the exception for pairs that failed; stats
+    is shared by the pairs of one context (None on the pipeline path).
+    """
+    qa = _get_qa_pipe()
+    results = [None] * len(pairs)
+    by_context = {}
+    for i, (_, context) in enumerate(pairs):
+        if context:
+            by_context.setdefault(context, []).append(i)
+        else:
+            results[i] = ValueError("context is empty")
+    if not by_context:
+        return results
+
+    if QA_SHARED_CONTEXT and getattr(qa.tokenizer, "is_fast", False):
+        groups = [([pairs[i][0] for i in idx], context) for context, idx in by_context.items()]
+        try:
+            for idx, (answers, stats) in zip(by_context.values(), answer_groups(qa, groups, batch_size=QA_BATCH_SIZE)):
+                for i, answer in zip(idx, answers):
+                    results[i] = (answer, stats)
+            return results
+        except Exception as e:
+            print(f"[ai_extractor] Shared-context QA failed, falling back to the pipeline: {e}")
+    todo = [i for idx in by_context.values() for i in idx]
+    outputs = _ask_pipeline(qa, [pairs[i][0] for i in todo], [pairs[i][1] for i in todo], QA_BATCH_SIZE)
+    for i, out in zip(todo, outputs):
+        results[i] = out if isinstance(out, Exception) else (out, None)
+    return results
+
+# One batch in flight per inference worker
+_qa_batcher = scheduler.MicroBatcher("qa", _qa_batch, threads=workers.INFERENCE_WORKERS or 1)
+
+def _ask_pairs(pairs: list, debug: dict = None) -> list:
+    """
+    Answer (question, context) pairs through the result cache and the micro-batching
+    scheduler, which may batch them with other documents' questions. Returns one answer
+    dict per pair, in order, or the exception for pairs that failed so callers can record
+    per-field errors. Shared-context timings (including the tokenization time saved) are
+    summed into debug.
+    """
+    model_key = f"{_MODEL_QA}|{backends.INFERENCE_BACKEND}"
+    keys = [result_cache.make_key("qa", model_key, q, context) for q, context in pairs]
+    answers = [result_cache.get("qa", key) for key in keys]
+    todo = [i for i, out in enumerate(answers) if out is None]
+    if not todo:
+        return answers
+
+    if scheduler.MICROBATCH_ENABLED:
+        # Batched with concurrent requests' questions by the scheduler thread
+        outputs = _qa_batcher.map([pairs[i] for i in todo])
+    else:
+        try:
+            outputs = _qa_batch([pairs[i] for i in todo])
+        except Exception as e:
+            outputs = [e] * len(todo)
+    seen_stats = set()
+    for i, out in zip(todo, outputs):
+        if not isinstance(out, Exception):
+            out, stats = out
+            if debug is not None and stats is not None and id(stats) not in seen_stats:
+                seen_stats.add(id(stats))
+                for k, v in stats.items():
+                    debug[k] = round(debug.get(k, 0) + v, 3)
+            out = {k: (float(v) if k == "score" else v) for k, v in out.items()}
+            result_cache.put("qa", keys[i], out)
+        answers[i] = out
+    return answers
+
+def _ask_document(questions: list, text: str, context_chars: int = CONTEXT_CHARS, debug: dict = None) -> list:
+    """
+    Answer a document's questions: each question gets its retrieved passages as context
+    (or, with retrieval off, the first context_chars characters). Questions that retrieve
+    the same passages share one encoded context.
+    """
+    if not QA_RETRIEVAL:
+        ctx = _clean_text(text, max_chars=context_chars)
+        return _ask_pairs([(q, ctx) for q in questions], debug=debug)
+
+    t0 = time.perf_counter()
+    index = PassageIndex(_clean_text(text, max_chars=MAX_DOCUMENT_CHARS), count_tokens=_qa_token_counter())
+    contexts = [index.context_for(q, QA_TOP_K, QA_TOKEN_BUDGET) for q in questions]
+    retrieval_ms = (time.perf_counter() - t0) * 1000
+
+    answers = _ask_pairs(list(zip(questions, contexts)), debug=debug)
+    if debug is not None:
+        debug.update({
+            "passages": len(index),
+            "contexts": len(set(contexts)),
+            "retrieval_ms": round(retrieval_ms, 3),
+        })
+    return answers
+
+def _ask_pipeline(qa, questions: list, contexts: list, batch_size: int) -> list:
+    try:
+        outputs = qa(question=questions, context=contexts, batch_size=batch_size)
+        return [outputs] if isinstance(outputs, dict) else outputs
+    except Exception:
+        # Fall back to one call per question so one bad question doesn't fail the rest
+        outputs = []
+        for q, context in zip(questions, contexts):
+            try:
+                outputs.append(qa(question=q, context=context))
+            except Exception as e:
+                outputs.append(e)
+        return outputs
+
+def _clean_text(text: str, max_chars: int = CONTEXT_CHARS) -> str:
     if not text:
         return ""
     # Basic normalization: collapse whitespace and remove odd control chars
@@ -78,7 +242,7 @@ def _extract_currency_and_amount_from_text(s: str):
         return None, _parse_amount(m.group(1))
     return None, None
 
-def ai_extract_distribution_fields(text: str, min_score: float = 0.20, context_chars: int = 4000):
+def ai_extract_distribution_fields(text: str, min_score: float = 0.20, context_chars: int = CONTEXT_CHARS):
     """
     AI-first extraction for distribution fields using QA pipeline.
     Returns: (results_dict, sources_dict, raw_ai_responses_dict)
@@ -90,9 +254,6 @@ def ai_extract_distribution_fields(text: str, min_score: float = 0.20, context_c
     if os.getenv("DOCINTEL_AI", "1") == "0":
         return {}, {}, {}
 
-    ctx = _clean_text(text, max_chars=context_chars)
-    qa = _get_qa_pipe()
-
     questions = {
         "fund_id": "What is the name or ID of the fund?",
         "distribution_date": "What is the distribution date?",
@@ -104,10 +265,14 @@ def ai_extract_distribution_fields(text: str, min_score: float = 0.20, context_c
     results = {k: None for k in questions}
     sources = {k: None for k in questions}
     raw = {}
+    qa_debug = {}
+    answers = dict(zip(questions, _ask_document(list(questions.values()), text, context_chars, debug=qa_debug)))
 
     for key, q in questions.items():
         try:
-            out = qa(question=q, context=ctx)
+            out = answers[key]
+            if isinstance(out, Exception):
+                raise out
             ans = out.get("answer", "").strip()
             score = float(out.get("score", 0.0))
             raw[key] = {"answer": ans, "score": score}
@@ -157,12 +322,15 @@ def ai_extract_distribution_fields(text: str, min_score: float = 0.20, context_c
                 results["currency"] = cands[0].upper()
                 sources["currency"] = "ai_context"
 
+    if qa_debug:
+        # Retrieval and shared-context QA timings, including the tokenization time saved
+        raw["_qa"] = qa_debug
     return results, sources, raw
 
 def ai_extract_capital_call_fields(
     text: str,
     min_score: float = 0.20,
-    context_chars: int = 4000
+    context_chars: int = CONTEXT_CHARS
 ):
     """
     AI-first extraction for Capital Call letters using QA pipeline.
@@ -174,9 +342,6 @@ def ai_extract_capital_call_fields(
     if os.getenv("DOCINTEL_AI", "1") == "0":
         return {}, {}, {}
 
-    ctx = _clean_text(text, max_chars=context_chars)
-    qa = _get_qa_pipe()
-
     questions = {
         "fund_id": "What is the Fund name or Fund ID in this capital call letter?",
         "call_date": "What is the call date, due date, or payment date?",
@@ -189,10 +354,14 @@ def ai_extract_capital_call_fields(
     results = {k: None for k in questions}
     sources = {k: None for k in questions}
     raw = {}
+    qa_debug = {}
+    answers = dict(zip(questions, _ask_document(list(questions.values()), text, context_chars, debug=qa_debug)))
 
     for key, q in questions.items():
         try:
-            out = qa(question=q, context=ctx)
+            out = answers[key]
+            if isinstance(out, Exception):
+                raise out
             ans = out.get("answer", "").strip()
             score = float(out.get("score", 0.0))
             raw[key] = {"answer": ans, "score": score}
@@ -234,12 +403,15 @@ def ai_extract_capital_call_fields(
                 results["currency"] = cands[0].upper()
                 sources["currency"] = "ai_context"
 
+    if qa_debug:
+        # Retrieval and shared-context QA timings, including the tokenization time saved
+        raw["_qa"] = qa_debug
     return results, sources, raw
 
 def ai_extract_valuation_fields(
     text: str,
     min_score: float = 0.20,
-    context_chars: int = 4000
+    context_chars: int = CONTEXT_CHARS
 ):
     """
     AI-first extraction for Valuation Reports using QA pipeline.
@@ -248,9 +420,6 @@ def ai_extract_valuation_fields(
     if os.getenv("DOCINTEL_AI", "1") == "0":
         return {}, {}, {}
 
-    ctx = _clean_text(text, max_chars=context_chars)
-    qa = _get_qa_pipe()
-
     questions = {
         "valuation_date": "What is the valuation date of the report?",
         "methodology": "What methodology or valuation approach was used (e.g., DCF, Market Approach, Cost Approach)?",
@@ -263,10 +432,14 @@ def ai_extract_valuation_fields(
     results = {k: None for k in questions}
     sources = {k: None for k in questions}
     raw = {}
+    qa_debug = {}
+    answers = dict(zip(questions, _ask_document(list(questions.values()), text, context_chars, debug=qa_debug)))
 
     for key, q in questions.items():
         try:
-            out = qa(question=q, context=ctx)
+            out = answers[key]
+            if isinstance(out, Exception):
+                raise out
             ans = out.get("answer", "").strip()
             score = float(out.get("score", 0.0))
             raw[key] = {"answer": ans, "score": score}
@@ -302,12 +475,15 @@ def ai_extract_valuation_fields(
             results[key] = None
             sources[key] = "ai_error"
 
+    if qa_debug:
+        # Retrieval and shared-context QA timings, including the tokenization time saved
+        raw["_qa"] = qa_debug
     return results, sources, raw
 
 def ai_extract_quarterly_fields(
     text: str,
     min_score: float = 0.15,
-    context_chars: int = 4000,
+    context_chars: int = CONTEXT_CHARS,
     metrics: list | None = None,
     max_kpis: int = 12,
     max_highlights: int = 8
@@ -324,9 +500,6 @@ def ai_extract_quarterly_fields(
     if os.getenv("DOCINTEL_AI", "1") == "0":
         return {"kpis": [], "highlights": []}, {"kpis": {}, "highlights": "ai_off"}, {}
 
-    ctx = _clean_text(text, max_chars=context_chars)
-    qa = _get_qa_pipe()
-
     if metrics is None:
         metrics = [
             "Revenue", "ARR", "Net income", "Operating income", "Gross margin",
@@ -337,6 +510,7 @@ def ai_extract_quarterly_fields(
     results = {"kpis": [], "highlights": []}
     sources = {"kpis": {}, "highlights": None}
     raw = {}
+    qa_debug = {}
 
     # Helper to parse percent/bps in a short string
     def _parse_pct(s: str):
@@ -351,11 +525,19 @@ def ai_extract_quarterly_fields(
             return m.group(2).strip() + " bps"
         return None
 
+    # All KPI questions plus the highlights question go through one batched call
+    qh = f"List up to {max_highlights} one-sentence highlights about performance, growth, or strategic events from this document. Separate each highlight with '||'."
+    kpi_questions = [
+        f"What is the {metric} reported in this document? Provide the value and percent change if available."
+        for metric in metrics
+    ]
+    *kpi_answers, highlights_answer = _ask_document(kpi_questions + [qh], text, context_chars, debug=qa_debug)
+
     # Ask targeted KPI questions
-    for metric in metrics:
-        q = f"What is the {metric} reported in this document? Provide the value and percent change if available."
+    for metric, out in zip(metrics, kpi_answers):
         try:
-            out = qa(question=q, context=ctx)
+            if isinstance(out, Exception):
+                raise out
             ans = (out.get("answer") or "").strip()
             score = float(out.get("score", 0.0))
             raw[metric] = {"answer": ans, "score": score}
@@ -401,9 +583,10 @@ def ai_extract_quarterly_fields(
             continue
 
     # Extract narrative highlights: ask QA to return a compact list separated by a sentinel
-    qh = f"List up to {max_highlights} one-sentence highlights about performance, growth, or strategic events from this document. Separate each highlight with '||'."
     try:
-        out_h = qa(question=qh, context=ctx)
+        out_h = highlights_answer
+        if isinstance(out_h, Exception):
+            raise out_h
         ans_h = (out_h.get("answer") or "").strip()
         score_h = float(out_h.get("score", 0.0))
         raw["highlights"] = {"answer": ans_h, "score": score_h}
@@ -424,4 +607,7 @@ def ai_extract_quarterly_fields(
         raw["highlights"] = {"error": str(e)}
         sources["highlights"] = "ai_error"
 
+    if qa_debug:
+        # Retrieval and shared-context QA timings, including the tokenization time saved
+        raw["_qa"] = qa_debug
     return results, sources, raw
@@ -0,0 +1,129 @@
+# app/extract/passages.py
+# Per-document passage index for QA. The cleaned document is split into overlapping
+# sentence windows, and each question gets the BM25 top-k windows that fit its token
+# budget. The QA model then reads the relevant parts of the whole document instead of
+# a fixed-length prefix.
+import math
+import re
+from collections import Counter
+from typing import Callable, List, Optional
+
+# Target passage length; a passage is a run of whole sentences unless one sentence is longer
+PASSAGE_CHARS = 600
+# Sentences shared by consecutive passages, so a field split across a boundary stays whole
+OVERLAP_SENTENCES = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+# Question boilerplate that says nothing about where the answer is
+_STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "by", "described", "do", "does", "for",
+    "from", "how", "if", "in", "is", "it", "its", "of", "on", "or", "provide", "reported",
+    "the", "this", "to", "what", "when", "which", "who", "with", "document", "available",
+}
+
+
+def _terms(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _estimate_tokens(text: str) -> int:
+    # Subword tokenizers produce a little more than one token per word or symbol
+    return int(len(re.findall(r"\w+|[^\w\s]", text)) * 1.3) + 1
+
+
+def split_passages(text: str, passage_chars: int = PASSAGE_CHARS, overlap: int = OVERLAP_SENTENCES) -> List[str]:
+    """Split cleaned text into windows of whole sentences of about passage_chars each."""
+    sentences = []
+    for sentence in _SENTENCE_RE.split(text):
+        # Tables and run-on text have no sentence breaks; cut them at word boundaries
+        while len(sentence) > passage_chars:
+            cut = sentence.rfind(" ", 0, passage_chars)
+            cut = cut if cut > 0 else passage_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            sentences.append(sentence)
+
+    passages, start = [], 0
+    while start < len(sentences):
+        end, size = start, 0
+        while end < len(sentences) and (end == start or size + len(sentences[end]) <= passage_chars):
+            size += len(sentences[end]) + 1
+            end += 1
+        passages.append(" ".join(sentences[start:end]))
+        if end >= len(sentences):
+            break
+        start = max(start + 1, end - overlap)
+    return passages
+
+
+class PassageIndex:
+    """BM25 index over one document's passages."""
+
+    def __init__(self, text: str, count_tokens: Optional[Callable[[str], int]] = None,
+                 passage_chars: int = PASSAGE_CHARS):
+        self.passages = split_passages(text, passage_chars) if text else []
+        count_tokens = count_tokens or _estimate_tokens
+        self.token_counts = [count_tokens(p) for p in self.passages]
+        self._tfs = [Counter(_terms(p)) for p in self.passages]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        df = Counter(term for tf in self._tfs for term in tf)
+        n = len(self.passages)
+        self._idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def __len__(self):
+        return len(self.passages)
+
+    def scores(self, query: str) -> List[float]:
+        terms = set(_terms(query))
+        out = []
+        for tf, length in zip(self._tfs, self._lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_len) if self._avg_len else BM25_K1
+            out.append(sum(
+                self._idf[t] * tf[t] * (BM25_K1 + 1) / (tf[t] + norm)
+                for t in terms if t in tf
+            ))
+        return out
+
+    def select(self, query: str, top_k: int, token_budget: int) -> List[int]:
+        """
+        Indices (in document order) of the best-scoring passages for query: at most top_k,
+        and within token_budget except that the best passage is always kept. When no
+        passage shares a term with the query, the document's opening passages are used.
+        """
+        scores = self.scores(query)
+        if any(scores):
+            ranked = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+            ranked = [i for i in ranked if scores[i] > 0]
+        else:
+            ranked = list(range(len(scores)))
+        chosen, used = [], 0
+        for i in ranked:
+            if len(chosen) >= top_k:
+                break
+            if chosen and used + self.token_counts[i] > token_budget:
+                continue
+            chosen.append(i)
+            used += self.token_counts[i]
+        return sorted(chosen)
+
+    def context_for(self, query: str, top_k: int, token_budget: int) -> str:
+        """The selected passages joined in document order; overlapping sentences are not repeated."""
+        return " ".join(self._merge(self.select(query, top_k, token_budget)))
+
+    def _merge(self, indices: List[int]) -> List[str]:
+        parts = []
+        for prev, i in zip([None] + indices, indices):
+            text = self.passages[i]
+            if prev is not None and i == prev + 1 and OVERLAP_SENTENCES:
+                # Adjacent passages share their boundary sentence(s); drop the repeat
+                head = " ".join(_SENTENCE_RE.split(self.passages[prev])[-OVERLAP_SENTENCES:])
+                if text.startswith(head):
+                    text = text[len(head):].lstrip()
+            if text:
+                parts.append(text)
+        return parts
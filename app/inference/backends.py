@@ -0,0 +1,93 @@
+# app/inference/backends.py
+# Pluggable CPU inference backends for the zero-shot classifier and QA pipelines,
+# selected with DOCINTEL_INFERENCE_BACKEND:
+#   torch       - transformers fp32 PyTorch (default)
+#   torch-int8  - PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx-int8   - exported to ONNX, dynamically int8-quantized and run with ONNX Runtime
+#                 (needs `optimum[onnxruntime]`); exports are cached in DOCINTEL_ONNX_CACHE_DIR
+import os
+import re
+import shutil
+import tempfile
+
+INFERENCE_BACKEND = os.getenv("DOCINTEL_INFERENCE_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv(
+    "DOCINTEL_ONNX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "docintel", "onnx"),
+)
+
+BACKENDS = ("torch", "torch-int8", "onnx-int8")
+
+_ORT_MODEL_CLASSES = {
+    "zero-shot-classification": "ORTModelForSequenceClassification",
+    "question-answering": "ORTModelForQuestionAnswering",
+}
+_QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def build_pipeline(task: str, model_name: str, backend: str = None):
+    """A transformers pipeline for task/model_name running on the selected CPU backend."""
+    backend = backend or INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown DOCINTEL_INFERENCE_BACKEND {backend!r}; expected one of {BACKENDS}")
+    # Imported here so rules-only mode (DOCINTEL_AI=0) never loads torch/transformers
+    from transformers import pipeline
+
+    if backend == "onnx-int8":
+        from transformers import AutoTokenizer
+
+        model_dir = onnx_model_dir(task, model_name)
+        model = _ort_model_class(task).from_pretrained(model_dir, file_name=_QUANTIZED_FILE)
+        return pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_dir), device=-1)
+
+    pipe = pipeline(task, model=model_name, device=-1)
+    if backend == "torch-int8":
+        import torch
+
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def _ort_model_class(task: str):
+    import optimum.onnxruntime
+
+    return getattr(optimum.onnxruntime, _ORT_MODEL_CLASSES[task])
+
+
+def onnx_model_dir(task: str, model_name: str) -> str:
+    """
+    Directory holding the int8 ONNX export of model_name (plus its tokenizer),
+    exporting and quantizing it on first use.
+    """
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    safe_name = re.sub(r"[^\w.-]+", "__", model_name.strip("/"))
+    model_dir = os.path.join(ONNX_CACHE_DIR, f"{safe_name}--{task}--int8")
+    if os.path.exists(os.path.join(model_dir, _QUANTIZED_FILE)):
+        return model_dir
+
+    print(f"[inference] exporting {model_name} to ONNX (int8) in {model_dir}")
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    # Export into a scratch directory and rename, so concurrent workers never load a partial export
+    work_dir = tempfile.mkdtemp(dir=ONNX_CACHE_DIR, prefix=".export-")
+    try:
+        model = _ort_model_class(task).from_pretrained(model_name, export=True)
+        model.save_pretrained(work_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(work_dir)
+        quantizer = ORTQuantizer.from_pretrained(work_dir)
+        # Dynamic (weights-only calibration-free) int8; avx2 kernels run on any x86-64 node
+        quantizer.quantize(
+            save_dir=work_dir,
+            quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+        )
+        try:
+            os.rename(work_dir, model_dir)
+        except OSError:
+            # Another process finished the same export first
+            if not os.path.exists(os.path.join(model_dir, _QUANTIZED_FILE)):
+                raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return model_dir
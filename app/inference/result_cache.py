@@ -0,0 +1,172 @@
+# app/inference/result_cache.py
+# Cache of model outputs (zero-shot scores, QA answers) keyed by model name, the
+# question/hypothesis and a hash of the cleaned input text, so templates that differ only
+# in whitespace and re-extractions of stored documents skip the model call.
+# In-process LRU with TTL, plus an optional SQLite layer shared across processes/restarts.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+RESULT_CACHE_ENABLED = os.getenv("DOCINTEL_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_SIZE = int(os.getenv("DOCINTEL_RESULT_CACHE_SIZE", "4096"))
+# Seconds an entry stays valid; 0 keeps entries until evicted
+RESULT_CACHE_TTL = int(os.getenv("DOCINTEL_RESULT_CACHE_TTL", "86400"))
+# Set to a file path to enable the persistent layer
+RESULT_CACHE_PATH = os.getenv("DOCINTEL_RESULT_CACHE_PATH")
+RESULT_CACHE_MAX_ROWS = int(os.getenv("DOCINTEL_RESULT_CACHE_MAX_ROWS", "100000"))
+
+_entries = OrderedDict()  # key -> (stored_at, value)
+_lock = threading.Lock()
+_initialized = False
+_init_lock = threading.Lock()
+_stats = {}
+_disk_puts = 0
+
+
+def make_key(kind: str, model: str, prompt: str, text: str) -> str:
+    """kind is "classify" or "qa"; prompt is the question or the hypothesis + labels."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{kind}\0{model}\0{prompt}\0{text_hash}".encode("utf-8")).hexdigest()
+
+
+def _count(kind: str, outcome: str):
+    with _lock:
+        counts = _stats.setdefault(kind, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+
+def _expired(stored_at: float) -> bool:
+    return RESULT_CACHE_TTL > 0 and time.time() - stored_at > RESULT_CACHE_TTL
+
+
+def get(kind: str, key: str):
+    """Cached value for key, or None."""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            if _expired(entry[0]):
+                del _entries[key]
+            else:
+                _entries.move_to_end(key)
+    if entry is not None and not _expired(entry[0]):
+        _count(kind, "memory_hits")
+        return entry[1]
+
+    if RESULT_CACHE_PATH:
+        stored = _disk_get(key)
+        if stored is not None:
+            _remember(key, stored[0], stored[1])
+            _count(kind, "disk_hits")
+            return stored[1]
+    _count(kind, "misses")
+    return None
+
+
+def put(kind: str, key: str, value):
+    """Store a JSON-serializable value."""
+    if not RESULT_CACHE_ENABLED:
+        return
+    now = time.time()
+    _remember(key, now, value)
+    if RESULT_CACHE_PATH:
+        _disk_put(key, kind, now, value)
+
+
+def _remember(key: str, stored_at: float, value):
+    with _lock:
+        _entries[key] = (stored_at, value)
+        _entries.move_to_end(key)
+        while len(_entries) > RESULT_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    os.makedirs(os.path.dirname(os.path.abspath(RESULT_CACHE_PATH)), exist_ok=True)
+    conn = sqlite3.connect(RESULT_CACHE_PATH, timeout=30)
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    " key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL,"
+                    " stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+                conn.commit()
+                _initialized = True
+    return conn
+
+
+@contextmanager
+def _db():
+    # One short-lived connection per operation: safe across threads and processes
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _disk_get(key: str) -> Optional[tuple]:
+    with _db() as conn:
+        row = conn.execute("SELECT value, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if _expired(stored_at):
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+    return stored_at, json.loads(value)
+
+
+def _disk_put(key: str, kind: str, now: float, value):
+    global _disk_puts
+    with _lock:
+        _disk_puts += 1
+        # Trimming scans the table, so only do it every 100 writes
+        trim = _disk_puts % 100 == 0
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, kind, value, stored_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, kind, json.dumps(value), now, now),
+        )
+        if not trim:
+            return
+        # Drop least recently used rows beyond the limit
+        conn.execute(
+            "DELETE FROM results WHERE key IN ("
+            " SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (RESULT_CACHE_MAX_ROWS,),
+        )
+
+
+def stats() -> dict:
+    with _lock:
+        by_kind = {kind: dict(counts) for kind, counts in _stats.items()}
+        size = len(_entries)
+    for counts in by_kind.values():
+        total = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        counts["hit_rate"] = round((total - counts["misses"]) / total, 4) if total else 0.0
+    return {
+        "enabled": RESULT_CACHE_ENABLED,
+        "persistent": bool(RESULT_CACHE_PATH),
+        "entries": size,
+        **by_kind,
+    }
@@ -0,0 +1,165 @@
+# app/inference/scheduler.py
+# Cross-request micro-batching. Concurrent ingests submit model work (zero-shot texts,
+# QA question/context pairs) to a MicroBatcher. A scheduler thread gathers items until
+# it has MICROBATCH_MAX_SIZE of them or the first has waited MICROBATCH_MAX_WAIT_MS,
+# runs the batch, and fans the results back out to the callers.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+MICROBATCH_ENABLED = os.getenv("DOCINTEL_MICROBATCH", "1") != "0"
+MICROBATCH_MAX_SIZE = int(os.getenv("DOCINTEL_MICROBATCH_MAX_SIZE", "32"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("DOCINTEL_MICROBATCH_MAX_WAIT_MS", "10"))
+# Only wait for more items if two callers overlapped within this many seconds; a lone
+# caller's items run as soon as they are queued
+CONCURRENCY_WINDOW_SECONDS = 1.0
+
+_batchers = {}
+_registry_lock = threading.Lock()
+
+
+class MicroBatcher:
+    """
+    Batches items from any number of threads through run_batch(items) -> results, which
+    must return one result per item, in order. A result may be an Exception instance.
+    If run_batch raises, the batch's items are re-run one at a time so one bad input
+    does not fail other requests' items. threads > 1 keeps that many batches in flight,
+    for run_batch functions that hand the work to other processes.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[list], list],
+                 max_size: int = None, max_wait_ms: float = None, threads: int = 1):
+        self.name = name
+        self.run_batch = run_batch
+        self.threads = max(1, threads)
+        self.max_size = max(1, max_size or MICROBATCH_MAX_SIZE)
+        self.max_wait = (MICROBATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self._queue = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._active = 0
+        self._last_concurrent = float("-inf")
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0, "items": 0, "max_batch_size": 0, "max_queue_depth": 0,
+            "wait_seconds": 0.0, "run_seconds": 0.0, "batch_sizes": {},
+        }
+        with _registry_lock:
+            _batchers[name] = self
+
+    def submit(self, item) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((time.perf_counter(), item, future))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        return future
+
+    def map(self, items: list) -> list:
+        """Submit items and wait for their results (Exception instances for failed items)."""
+        with self._stats_lock:
+            self._active += 1
+            if self._active > 1:
+                self._last_concurrent = time.perf_counter()
+        try:
+            futures = [self.submit(item) for item in items]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+            return results
+        finally:
+            with self._stats_lock:
+                self._active -= 1
+
+    def _ensure_started(self):
+        if not self._started:
+            with self._start_lock:
+                if not self._started:
+                    for n in range(self.threads):
+                        threading.Thread(
+                            target=self._loop, name=f"microbatch-{self.name}-{n}", daemon=True
+                        ).start()
+                    self._started = True
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = batch[0][0] + self.max_wait
+        with self._stats_lock:
+            if batch[0][0] - self._last_concurrent > CONCURRENCY_WINDOW_SECONDS:
+                deadline = batch[0][0]
+        while len(batch) < self.max_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Take whatever is already queued even once the deadline has passed
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            items = [item for _, item, _ in batch]
+            try:
+                results = self._run(items)
+            except Exception:
+                results = []
+                for item in items:
+                    try:
+                        results.extend(self._run([item]))
+                    except Exception as e:
+                        results.append(e)
+            finished = time.perf_counter()
+
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+            with self._stats_lock:
+                s = self._stats
+                s["batches"] += 1
+                s["items"] += len(batch)
+                s["max_batch_size"] = max(s["max_batch_size"], len(batch))
+                s["wait_seconds"] += sum(started - queued for queued, _, _ in batch)
+                s["run_seconds"] += finished - started
+                s["batch_sizes"][len(batch)] = s["batch_sizes"].get(len(batch), 0) + 1
+
+    def _run(self, items: list) -> list:
+        results = self.run_batch(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} items")
+        return results
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            s = dict(self._stats, batch_sizes=dict(sorted(self._stats["batch_sizes"].items())))
+        return {
+            "threads": self.threads,
+            "max_size": self.max_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": s["max_queue_depth"],
+            "batches": s["batches"],
+            "items": s["items"],
+            "avg_batch_size": round(s["items"] / s["batches"], 3) if s["batches"] else 0.0,
+            "max_batch_size": s["max_batch_size"],
+            "batch_sizes": s["batch_sizes"],
+            "avg_wait_ms": round(s["wait_seconds"] / s["items"] * 1000, 3) if s["items"] else 0.0,
+            "avg_run_ms": round(s["run_seconds"] / s["batches"] * 1000, 3) if s["batches"] else 0.0,
+        }
+
+
+def stats() -> dict:
+    with _registry_lock:
+        batchers = dict(_batchers)
+    return {"enabled": MICROBATCH_ENABLED, **{name: b.stats() for name, b in batchers.items()}}
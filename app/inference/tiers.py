@@ -0,0 +1,46 @@
+# app/inference/tiers.py
+# Model tiers trade accuracy for latency/memory. DOCINTEL_MODEL_TIER picks one for both
+# the zero-shot classifier and the QA extractor; DOCINTEL_CLASSIFIER_MODEL /
+# DOCINTEL_QA_MODEL override a single model, and DOCINTEL_MODEL_TIERS_FILE (JSON,
+# {"tier": {"classifier": ..., "qa": ...}}) adds or redefines tiers.
+import json
+import os
+
+MODEL_TIERS = {
+    "fast": {
+        "classifier": "typeform/distilbert-base-uncased-mnli",
+        "qa": "distilbert-base-cased-distilled-squad",
+    },
+    "balanced": {
+        "classifier": "valhalla/distilbart-mnli-12-3",
+        "qa": "deepset/roberta-base-squad2",
+    },
+    "accurate": {
+        "classifier": "facebook/bart-large-mnli",
+        "qa": "deepset/roberta-large-squad2",
+    },
+}
+
+MODEL_TIERS_FILE = os.getenv("DOCINTEL_MODEL_TIERS_FILE")
+if MODEL_TIERS_FILE:
+    with open(MODEL_TIERS_FILE) as f:
+        for _tier, _models in json.load(f).items():
+            MODEL_TIERS[_tier] = {**MODEL_TIERS.get(_tier, {}), **_models}
+
+MODEL_TIER = os.getenv("DOCINTEL_MODEL_TIER", "accurate")
+
+_OVERRIDES = {
+    "classifier": "DOCINTEL_CLASSIFIER_MODEL",
+    "qa": "DOCINTEL_QA_MODEL",
+}
+
+
+def model_for(role: str, tier: str = None) -> str:
+    """Model name for role ("classifier" or "qa") in the configured (or given) tier."""
+    override = os.getenv(_OVERRIDES[role])
+    if override and tier is None:
+        return override
+    tier = tier or MODEL_TIER
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"Unknown DOCINTEL_MODEL_TIER {tier!r}; expected one of {sorted(MODEL_TIERS)}")
+    return MODEL_TIERS[tier][role]
@@ -0,0 +1,127 @@
+# app/inference/warmup.py
+# Opt-in model preloading (DOCINTEL_PRELOAD_MODELS=1): build the zero-shot and QA
+# pipelines at API startup and run one inference through each, so the first upload
+# after a deploy does not pay for model load and first-call warmup. Load/warmup
+# durations are recorded for the readiness endpoint.
+import os
+import threading
+import time
+
+PRELOAD_MODELS = os.getenv("DOCINTEL_PRELOAD_MODELS", "0") != "0"
+
+_WARMUP_TEXT = (
+    "Capital Call Notice. Investors are requested to fund their capital contribution "
+    "of USD 1,000,000 by March 31, 2024."
+)
+
+_state = {"state": "not_started", "models": {}, "error": None}
+_state_lock = threading.Lock()
+
+
+def _ai_enabled() -> bool:
+    return os.getenv("DOCINTEL_AI", "1") != "0"
+
+
+def _set_model(name: str, **fields):
+    with _state_lock:
+        _state["models"].setdefault(name, {}).update(fields)
+
+
+def _load_zero_shot():
+    from app.classify.ai_classifier import _get_pipe, _run_classify_batch
+
+    t0 = time.perf_counter()
+    _get_pipe()
+    _set_model("zero_shot", load_seconds=round(time.perf_counter() - t0, 3))
+    t0 = time.perf_counter()
+    # Straight to the pipeline: a result-cache hit would skip the forward pass
+    _run_classify_batch([_WARMUP_TEXT], batch_size=1)
+    _set_model("zero_shot", warmup_seconds=round(time.perf_counter() - t0, 3), loaded=True)
+
+
+def _load_qa():
+    from app.extract.ai_extractor import _get_qa_pipe
+
+    t0 = time.perf_counter()
+    qa = _get_qa_pipe()
+    _set_model("qa", load_seconds=round(time.perf_counter() - t0, 3))
+    t0 = time.perf_counter()
+    qa(question="What is the capital call amount?", context=_WARMUP_TEXT)
+    _set_model("qa", warmup_seconds=round(time.perf_counter() - t0, 3), loaded=True)
+
+
+def _load_workers():
+    from app.inference import workers
+
+    # Each worker loads and warms both models in its initializer
+    t0 = time.perf_counter()
+    started = workers.warm()
+    _set_model("inference_workers", workers=started, load_seconds=round(time.perf_counter() - t0, 3),
+               loaded=started == workers.INFERENCE_WORKERS)
+
+
+def _load_fast_classifier():
+    from app.classify import fast_classifier
+
+    t0 = time.perf_counter()
+    fast_classifier.load_model()
+    _set_model("fast_classifier", load_seconds=round(time.perf_counter() - t0, 3),
+               loaded=fast_classifier.stats()["model_loaded"])
+
+
+def preload():
+    """Load and warm up every model the pipeline will use. Safe to call more than once."""
+    with _state_lock:
+        if _state["state"] in ("loading", "ready"):
+            return
+        _state["state"] = "loading"
+    print("[warmup] preloading models")
+    t0 = time.perf_counter()
+    try:
+        if _ai_enabled():
+            from app.inference import workers
+
+            _load_fast_classifier()
+            if workers.enabled():
+                _load_workers()
+            else:
+                _load_zero_shot()
+                _load_qa()
+    except Exception as e:
+        print(f"[warmup] model preload failed: {e}")
+        with _state_lock:
+            _state["state"] = "failed"
+            _state["error"] = str(e)
+        return
+    with _state_lock:
+        _state["state"] = "ready"
+    print(f"[warmup] models ready in {time.perf_counter() - t0:.1f}s")
+
+
+def preload_in_background() -> threading.Thread:
+    # The API keeps answering liveness checks while models load
+    thread = threading.Thread(target=preload, name="docintel-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def models_ready() -> bool:
+    """
+    True when requests will not hit a cold model: preloading finished, or preloading
+    is off (models then load on first use) or AI is disabled.
+    """
+    if not PRELOAD_MODELS or not _ai_enabled():
+        return True
+    with _state_lock:
+        return _state["state"] == "ready"
+
+
+def status() -> dict:
+    with _state_lock:
+        return {
+            "preload": PRELOAD_MODELS,
+            "ai_enabled": _ai_enabled(),
+            "state": _state["state"],
+            "models": {name: dict(info) for name, info in _state["models"].items()},
+            "error": _state["error"],
+        }
@@ -0,0 +1,158 @@
+# app/inference/workers.py
+# Optional inference worker processes (DOCINTEL_INFERENCE_WORKERS > 0). Zero-shot and QA
+# batches are sent over multiprocessing queues to a pool of spawned processes, each
+# holding its own models and running DOCINTEL_INFERENCE_TORCH_THREADS torch threads. The
+# API process then never loads the models, and inference does not compete with request
+# handling for the GIL. With 0 workers (the default) models run in the calling process.
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+INFERENCE_WORKERS = int(os.getenv("DOCINTEL_INFERENCE_WORKERS", "0"))
+# Default: share the machine's cores between the workers
+TORCH_THREADS = int(os.getenv(
+    "DOCINTEL_INFERENCE_TORCH_THREADS",
+    str(max(1, (os.cpu_count() or 1) // max(1, INFERENCE_WORKERS))),
+))
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"tasks": 0, "failures": 0, "restarts": 0, "in_flight": 0, "seconds": 0.0}
+
+
+def enabled() -> bool:
+    return INFERENCE_WORKERS > 0
+
+
+def _init_worker(torch_threads: int):
+    global INFERENCE_WORKERS
+    # Workers run their models directly; they must not start pools of their own
+    INFERENCE_WORKERS = 0
+    os.environ["DOCINTEL_INFERENCE_WORKERS"] = "0"
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    if os.getenv("DOCINTEL_PRELOAD_MODELS", "0") != "0" and os.getenv("DOCINTEL_AI", "1") != "0":
+        _load_models()
+
+
+def _load_models():
+    # Load and run each model once so the first real batch is not slow
+    from app.classify.ai_classifier import _run_classify_batch
+    from app.extract.ai_extractor import _run_qa_batch
+    from app.inference.warmup import _WARMUP_TEXT
+
+    t0 = time.perf_counter()
+    _run_classify_batch([_WARMUP_TEXT], batch_size=1)
+    _run_qa_batch([("What is the capital call amount?", _WARMUP_TEXT)])
+    print(f"[workers] pid {os.getpid()} loaded models in {time.perf_counter() - t0:.1f}s")
+
+
+def _ping() -> int:
+    # Short sleep so pings spread over idle workers instead of one worker taking them all
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that already runs threads (and maybe torch) is unsafe
+                _pool = ProcessPoolExecutor(
+                    max_workers=INFERENCE_WORKERS,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(TORCH_THREADS,),
+                )
+                print(f"[workers] started {INFERENCE_WORKERS} inference workers, {TORCH_THREADS} torch threads each")
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+            with _stats_lock:
+                _stats["restarts"] += 1
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def run(fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) in a worker process when workers are enabled, else in this one.
+    fn must be a module-level function. A crashed worker (e.g. out of memory) breaks the
+    pool; it is replaced and the call retried once.
+    """
+    if not enabled():
+        return fn(*args, **kwargs)
+    with _stats_lock:
+        _stats["in_flight"] += 1
+    t0 = time.perf_counter()
+    try:
+        for attempt in range(2):
+            pool = _get_pool()
+            try:
+                return pool.submit(fn, *args, **kwargs).result()
+            except BrokenProcessPool:
+                print("[workers] an inference worker died; restarting the pool")
+                _reset_pool(pool)
+                if attempt:
+                    raise
+    except Exception:
+        with _stats_lock:
+            _stats["failures"] += 1
+        raise
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+            _stats["tasks"] += 1
+            _stats["seconds"] += time.perf_counter() - t0
+
+
+def warm(timeout: float = 1800.0) -> int:
+    """
+    Start the pool and wait until every worker has finished its initializer (which loads
+    the models when DOCINTEL_PRELOAD_MODELS=1). Returns the number of workers seen.
+    """
+    if not enabled():
+        return 0
+    pids, deadline = set(), time.monotonic() + timeout
+    while len(pids) < INFERENCE_WORKERS and time.monotonic() < deadline:
+        pool = _get_pool()
+        futures = [pool.submit(_ping) for _ in range(INFERENCE_WORKERS)]
+        pids.update(f.result() for f in futures)
+    return len(pids)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        s = dict(_stats)
+    return {
+        "workers": INFERENCE_WORKERS,
+        "torch_threads": TORCH_THREADS if enabled() else None,
+        "started": _pool is not None,
+        "tasks": s["tasks"],
+        "failures": s["failures"],
+        "restarts": s["restarts"],
+        "in_flight": s["in_flight"],
+        "avg_task_ms": round(s["seconds"] / s["tasks"] * 1000, 3) if s["tasks"] else 0.0,
+    }
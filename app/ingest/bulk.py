@@ -0,0 +1,262 @@
+# app/ingest/bulk.py
+# Bulk directory ingestion for backfills:
+#   python -m app.ingest.bulk data/provided_dataset --workers 4
+# PDFs are processed in a process pool, written to Mongo with batched insert_many,
+# and recorded in a checkpoint manifest so an interrupted run resumes where it stopped.
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from pymongo.errors import BulkWriteError
+
+from app.db.mongo import close_client, get_db
+from app.ingest import dedup
+from app.ingest.ingest import CLASSIFY_BATCH_SIZE, build_documents
+
+MANIFEST_NAME = ".docintel_bulk_manifest.jsonl"
+
+
+def find_pdfs(root: str, recursive: bool = True) -> list:
+    paths = []
+    if recursive:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if name.lower().endswith(".pdf"):
+                    paths.append(os.path.join(dirpath, name))
+    else:
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name.lower().endswith(".pdf") and os.path.isfile(path):
+                paths.append(path)
+    return sorted(paths)
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """Return {path: entry} for every file already recorded in the manifest."""
+    done = {}
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # a partially written last line from an interrupted run
+                continue
+            done[entry["path"]] = entry
+    return done
+
+
+def _process_chunk(chunk: list, classify_batch_size: int):
+    # Runs in a worker process: everything except the Mongo write, for a chunk of
+    # files classified together in one batched call. Files are already spread across
+    # processes, so pages are parsed serially here, and backfills store the full text.
+    built = build_documents(
+        [(path, None, content_hash) for path, content_hash in chunk],
+        batch_size=classify_batch_size,
+        parallel_pages=False,
+    )
+    return [(path, doc, error) for (path, _), (doc, error) in zip(chunk, built)]
+
+
+def _start_pool(workers: int) -> ProcessPoolExecutor:
+    # Forked workers must not inherit a MongoClient (its sockets and monitor threads are
+    # not fork-safe), so drop the parent's client and start every worker before Mongo is
+    # used again; with the fork start method the first submit launches the whole pool
+    close_client()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pool.submit(int).result()
+    return pool
+
+
+class _Throughput:
+    def __init__(self, total: int):
+        self.total = total
+        self.docs = 0
+        self.pages = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.reported = -1
+        self.t0 = time.perf_counter()
+
+    def report(self):
+        processed = self.docs + self.failed + self.duplicates
+        if self.reported == processed:
+            return
+        self.reported = processed
+        elapsed = max(time.perf_counter() - self.t0, 1e-9)
+        print(
+            f"[bulk] {processed}/{self.total} files "
+            f"({self.failed} failed, {self.duplicates} duplicates) | {self.docs / elapsed:.2f} docs/sec | "
+            f"{self.pages / elapsed:.2f} pages/sec | {elapsed:.1f}s elapsed",
+            flush=True,
+        )
+
+
+def _write_entry(manifest, path: str, **entry):
+    manifest.write(json.dumps({"path": path, **entry}) + "\n")
+
+
+def _flush(batch: list, manifest, stats: _Throughput):
+    if not batch:
+        return
+    db = get_db()
+    docs = [doc for _, doc in batch]
+    duplicate_idx = set()
+    try:
+        db.documents.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Content already stored (e.g. uploaded through the API meanwhile) is not an error
+        for err in e.details.get("writeErrors", []):
+            if err.get("code") != 11000:
+                raise
+            duplicate_idx.add(err["index"])
+    # Only checkpoint once the batch is safely in Mongo
+    for i, (path, doc) in enumerate(batch):
+        if i in duplicate_idx:
+            existing_id = dedup.find_existing(db, doc["content_hash"])
+            _write_entry(manifest, path, status="duplicate", document_id=existing_id)
+            stats.duplicates += 1
+            continue
+        _write_entry(manifest, path, status="done", document_id=str(doc["_id"]))
+        stats.docs += 1
+        stats.pages += doc.get("page_count", 0)
+    manifest.flush()
+    batch.clear()
+
+
+def _skip_known(todo: list, manifest, stats: _Throughput) -> list:
+    """
+    Hash every pending file and drop the ones whose content is already in Mongo
+    (or appears earlier in this run). Returns [(path, content_hash), ...] to process.
+    """
+    db = get_db()
+    dedup.ensure_index(db)
+    hashed = [(p, dedup.file_sha256(p)) for p in todo]
+    known = {}
+    hashes = [h for _, h in hashed]
+    for i in range(0, len(hashes), 1000):
+        for doc in db.documents.find({"content_hash": {"$in": hashes[i:i + 1000]}}, {"content_hash": 1}):
+            known[doc["content_hash"]] = str(doc["_id"])
+
+    pending = []
+    first_seen = {}
+    for path, content_hash in hashed:
+        if content_hash in known:
+            _write_entry(manifest, path, status="duplicate", document_id=known[content_hash])
+            stats.duplicates += 1
+        elif content_hash in first_seen:
+            _write_entry(manifest, path, status="duplicate", duplicate_of=first_seen[content_hash])
+            stats.duplicates += 1
+        else:
+            first_seen[content_hash] = path
+            pending.append((path, content_hash))
+    dedup.record(hit=True, count=stats.duplicates)
+    dedup.record(hit=False, count=len(pending))
+    manifest.flush()
+    return pending
+
+
+def run(root: str, workers: int, batch_size: int, manifest_path: str,
+        recursive: bool = True, retry_failed: bool = False,
+        classify_batch_size: int = CLASSIFY_BATCH_SIZE):
+    paths = find_pdfs(root, recursive=recursive)
+    seen = load_manifest(manifest_path)
+    todo = [
+        p for p in paths
+        if p not in seen or (retry_failed and seen[p].get("status") == "failed")
+    ]
+    print(f"[bulk] {len(paths)} PDFs found, {len(paths) - len(todo)} already processed, {len(todo)} to go")
+    if not todo:
+        return
+
+    stats = _Throughput(len(todo))
+    batch = []
+    pool = _start_pool(workers)
+    try:
+        with open(manifest_path, "a", encoding="utf-8") as manifest:
+            pending = _skip_known(todo, manifest, stats)
+            chunks = deque(
+                pending[i:i + classify_batch_size] for i in range(0, len(pending), classify_batch_size)
+            )
+            # Only a few chunks are handed to the pool at a time, so a worker crash
+            # (which takes every task still in the pool with it) costs at most those
+            in_flight = {}
+            while chunks or in_flight:
+                while chunks and len(in_flight) < 2 * workers:
+                    chunk = chunks.popleft()
+                    in_flight[pool.submit(_process_chunk, chunk, classify_batch_size)] = chunk
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                broken = any(isinstance(fut.exception(), BrokenProcessPool) for fut in done)
+                if broken:
+                    done = wait(in_flight).done
+                for fut in done:
+                    chunk = in_flight.pop(fut)
+                    try:
+                        results = fut.result()
+                    except BrokenProcessPool:
+                        results = [(path, None, "worker process died (e.g. out of memory); "
+                                                "rerun with --retry-failed")
+                                   for path, _ in chunk]
+                    for path, doc, error in results:
+                        if error:
+                            print(f"[bulk] failed {path}: {error}")
+                            _write_entry(manifest, path, status="failed", error=error)
+                            manifest.flush()
+                            stats.failed += 1
+                            continue
+                        batch.append((path, doc))
+                        if len(batch) >= batch_size:
+                            _flush(batch, manifest, stats)
+                            stats.report()
+                if broken:
+                    print("[bulk] a worker process died; restarting the pool", flush=True)
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = _start_pool(workers)
+            _flush(batch, manifest, stats)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    stats.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of PDFs into MongoDB.")
+    parser.add_argument("directory", help="Directory containing PDFs")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help="Number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=25, help="Documents per insert_many call")
+    parser.add_argument("--classify-batch-size", type=int, default=CLASSIFY_BATCH_SIZE,
+                        help="Documents per worker task, classified in one batched model call")
+    parser.add_argument("--manifest", default=None,
+                        help=f"Checkpoint manifest path (default: <directory>/{MANIFEST_NAME})")
+    parser.add_argument("--no-recursive", action="store_true", help="Only look at the top-level directory")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-process files that failed in a previous run")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 1
+
+    manifest_path = args.manifest or os.path.join(args.directory, MANIFEST_NAME)
+    run(
+        args.directory,
+        workers=args.workers,
+        batch_size=max(1, args.batch_size),
+        manifest_path=manifest_path,
+        recursive=not args.no_recursive,
+        retry_failed=args.retry_failed,
+        classify_batch_size=max(1, args.classify_batch_size),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
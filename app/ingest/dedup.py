@@ -0,0 +1,53 @@
+# app/ingest/dedup.py
+# Content-hash deduplication: the same PDF bytes are only parsed/classified/extracted once.
+import hashlib
+import threading
+from typing import Optional
+
+_CHUNK_SIZE = 1024 * 1024
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+_index_ready = False
+
+
+def file_sha256(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ensure_index(db):
+    """Unique index on documents.content_hash (documents ingested before hashing are left alone)."""
+    global _index_ready
+    if _index_ready:
+        return
+    db.documents.create_index(
+        "content_hash",
+        unique=True,
+        partialFilterExpression={"content_hash": {"$exists": True}},
+    )
+    _index_ready = True
+
+
+def find_existing(db, content_hash: str) -> Optional[str]:
+    doc = db.documents.find_one({"content_hash": content_hash}, {"_id": 1})
+    return str(doc["_id"]) if doc else None
+
+
+def record(hit: bool, count: int = 1):
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += count
+
+
+def stats() -> dict:
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
@@ -1,60 +1,375 @@
-import pdfplumber
 import os
-from datetime import datetime, timezone
+import time
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from pymongo.errors import DuplicateKeyError
 from app.db.mongo import get_db
-from app.classify.classifier import classify_text
+from app.ingest import dedup
+from app.ingest.pages import EXTRACT_TABLES, LeadingPageText, extract_pages, extract_tables
+from app.classify.ai_classifier import MAX_INPUT_CHARS
+from app.extract.ai_extractor import CONTEXT_CHARS, QA_RETRIEVAL
+from app.classify.classifier import classify_text, classify_texts
 from app.extract.distribution import extract_distribution_fields
 from app.extract.capital_call import extract_capital_call_fields
 from app.extract.valuation_reports import extract_valuation_fields
 from app.extract.quarterly_update import extract_quarterly_update_fields
 
-def ingest_pdf(file_path: str, original_filename: str | None = None) -> str:
-    
+# Uploaded files are persisted here and referenced by their document's filepath; they
+# are needed after ingestion (background text completion, lazy table extraction), so
+# the default lives next to the code rather than in the temp dir
+UPLOAD_DIR = os.getenv("DOCINTEL_UPLOAD_DIR", str(Path(__file__).resolve().parents[2] / "uploads"))
+# Retention: files no document or unfinished job references are deleted once older than
+# UPLOAD_ORPHAN_HOURS; with UPLOAD_RETENTION_DAYS > 0 the stored PDFs of fully parsed
+# documents older than that are deleted too (their tables can then no longer be extracted)
+UPLOAD_ORPHAN_HOURS = float(os.getenv("DOCINTEL_UPLOAD_ORPHAN_HOURS", "24"))
+UPLOAD_RETENTION_DAYS = float(os.getenv("DOCINTEL_UPLOAD_RETENTION_DAYS", "0"))
+
+# Page-budgeted ingestion: only parse the leading pages needed by the classifier and
+# the doc type's extractor, then fill in the rest of raw_text in the background.
+PAGE_BUDGET = os.getenv("DOCINTEL_PAGE_BUDGET", "0") != "0"
+
+# Documents sent through the zero-shot classifier together by the batched paths
+CLASSIFY_BATCH_SIZE = int(os.getenv("DOCINTEL_CLASSIFY_BATCH_SIZE", "8"))
+
+# Cleaned characters each stage actually looks at. With QA retrieval the extractors
+# search passages rather than a prefix, so page-budgeted ingestion reads a bounded
+# leading window (DOCINTEL_PAGE_BUDGET_QA_CHARS) for them to search, not the whole PDF
+_CLASSIFY_CHAR_BUDGET = MAX_INPUT_CHARS
+PAGE_BUDGET_QA_CHARS = int(os.getenv("DOCINTEL_PAGE_BUDGET_QA_CHARS", "20000"))
+_EXTRACT_CHAR_BUDGET = PAGE_BUDGET_QA_CHARS if QA_RETRIEVAL else CONTEXT_CHARS
+
+def _extract_fields(doc_type: str, text: str) -> dict:
+    if doc_type == "distribution_notice":
+        return extract_distribution_fields(text)
+    elif doc_type == "capital_call_letter":
+        return extract_capital_call_fields(text)
+    elif doc_type == "valuation_reports":
+        return extract_valuation_fields(text)
+    elif doc_type == "quarterly_update":
+        return extract_quarterly_update_fields(text)
+    return {}
+
+def build_document(
+    file_path: str,
+    original_filename: str | None = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    content_hash: str | None = None,
+    parallel_pages: Optional[bool] = None,
+    page_budget: Optional[bool] = None,
+) -> dict:
+
+    # Parse, classify and extract a PDF into the document dict stored in Mongo,
+    # without writing it (bulk ingestion batches the inserts itself).
+    # on_stage (optional) is called with "parsing", "classifying" and "extracting"
+    # as the pipeline moves along, so callers (e.g. the job queue) can track progress.
+    # parallel_pages overrides DOCINTEL_PAGE_PARALLEL (see app/ingest/pages.py) and
+    # page_budget overrides DOCINTEL_PAGE_BUDGET; a budgeted document is stored with
+    # text_status="partial" until complete_text() parses the remaining pages.
+    def _stage(name: str):
+        if on_stage:
+            on_stage(name)
+
     # error check
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File {file_path} does not exist.")
-    
-    with pdfplumber.open(file_path) as pdf:
 
-        text_parts = []
-        tables = []
+    content_hash = content_hash or dedup.file_sha256(file_path)
 
-        for page in pdf.pages:
-            # extract text
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
+    _stage("parsing")
+    if page_budget is None:
+        page_budget = PAGE_BUDGET
 
-            # extract tables
-            page_tables = page.extract_tables()
-            if page_tables:
-                tables.extend(page_tables)
+    if page_budget:
+        # Tables are always deferred in this mode; rules/regex fallbacks also only
+        # see the leading pages
+        tables = None
+        with LeadingPageText(file_path, file_hash=content_hash) as reader:
+            reader.read_until(_CLASSIFY_CHAR_BUDGET)
 
-        text = "\n".join(text_parts)
+            _stage("classifying")
+            doc_type = classify_text(reader.text)
 
-    db = get_db()
-    doc_type = classify_text(text)
+            _stage("extracting")
+            reader.read_until(_EXTRACT_CHAR_BUDGET if doc_type != "unknown" else 0)
+            text = reader.text
+            extracted_data = _extract_fields(doc_type, text)
+            page_count, pages_parsed = reader.page_count, reader.pages_read
+    else:
+        pages = extract_pages(
+            file_path, parallel=parallel_pages, with_tables=EXTRACT_TABLES, file_hash=content_hash
+        )
+        page_count = pages_parsed = len(pages)
+        text = "\n".join(page_text for page_text, _ in pages if page_text)
+        # With table extraction deferred, tables stay None until requested via the API
+        tables = [table for _, page_tables in pages for table in page_tables] if EXTRACT_TABLES else None
 
-    extracted_data = {}
-    if doc_type == "distribution_notice":
-        extracted_data = extract_distribution_fields(text)
-    elif doc_type == "capital_call_letter":
-        extracted_data = extract_capital_call_fields(text)
-    elif doc_type == "valuation_reports":
-        extracted_data = extract_valuation_fields(text)
-    elif doc_type == "quarterly_update":
-        extracted_data = extract_quarterly_update_fields(text)
+        _stage("classifying")
+        doc_type = classify_text(text)
+
+        _stage("extracting")
+        extracted_data = _extract_fields(doc_type, text)
 
-    doc = {
+    return _document_record(
+        file_path, original_filename, text, tables, page_count, pages_parsed,
+        content_hash, doc_type, extracted_data,
+    )
+
+def _document_record(file_path, original_filename, text, tables, page_count, pages_parsed,
+                     content_hash, doc_type, extracted_data) -> dict:
+    return {
     "filename": original_filename or os.path.basename(file_path),
     "filepath": file_path,
     "raw_text": text,
     "tables": tables,                       # list of tables (each table = list of rows)
+    "tables_status": "done" if tables is not None else "deferred",
+    "page_count": page_count,
+    "pages_parsed": pages_parsed,
+    "text_status": "complete" if pages_parsed >= page_count else "partial",
+    "content_hash": content_hash,
     "ingest_ts": datetime.now(timezone.utc),
     "status": "ingested",
-    "doc_type": doc_type,   
+    "doc_type": doc_type,
     "extracted_data": extracted_data,
     }
 
-    result = db.documents.insert_one(doc)
-    return str(result.inserted_id)
+def build_documents(items: list, batch_size: int = CLASSIFY_BATCH_SIZE,
+                    parallel_pages: Optional[bool] = None) -> list:
+    """
+    Batched build_document for bulk paths. items is [(file_path, original_filename, content_hash), ...]
+    (name and hash may be None). All documents are parsed first and then classified with
+    one batched classifier call. Returns [(doc_or_None, error_or_None), ...] in input order.
+    Page-budgeted mode does not apply here; full text is always parsed.
+    """
+    out = [(None, None)] * len(items)
+    parsed = []
+    for i, (file_path, original_filename, content_hash) in enumerate(items):
+        try:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File {file_path} does not exist.")
+            content_hash = content_hash or dedup.file_sha256(file_path)
+            pages = extract_pages(
+                file_path, parallel=parallel_pages, with_tables=EXTRACT_TABLES, file_hash=content_hash
+            )
+            text = "\n".join(page_text for page_text, _ in pages if page_text)
+            tables = [table for _, page_tables in pages for table in page_tables] if EXTRACT_TABLES else None
+            parsed.append((i, file_path, original_filename, content_hash, text, tables, len(pages)))
+        except Exception as e:
+            out[i] = (None, str(e))
+
+    doc_types = classify_texts([p[4] for p in parsed], batch_size=batch_size) if parsed else []
+
+    for (i, file_path, original_filename, content_hash, text, tables, page_count), doc_type in zip(parsed, doc_types):
+        try:
+            extracted_data = _extract_fields(doc_type, text)
+            out[i] = (_document_record(
+                file_path, original_filename, text, tables, page_count, page_count,
+                content_hash, doc_type, extracted_data,
+            ), None)
+        except Exception as e:
+            out[i] = (None, str(e))
+    return out
+
+def _stored_filepath(db, document_id: str) -> Optional[str]:
+    doc = db.documents.find_one({"_id": ObjectId(document_id)}, {"filepath": 1})
+    return doc.get("filepath") if doc else None
+
+def _discard_upload(path: Optional[str], keep: Optional[str] = None):
+    # Delete a stored upload no document needs any more. Only files in UPLOAD_DIR are
+    # ours to remove; PDFs ingested from elsewhere (CLI, scripts) are left alone.
+    if not path or path == keep:
+        return
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(UPLOAD_DIR):
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+def prune_uploads() -> int:
+    """
+    Apply the upload retention policy to UPLOAD_DIR. Returns how many files were deleted.
+    """
+    if not os.path.isdir(UPLOAD_DIR):
+        return 0
+    db = get_db()
+    removed = 0
+    if UPLOAD_RETENTION_DAYS > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=UPLOAD_RETENTION_DAYS)
+        expired = db.documents.find(
+            {"ingest_ts": {"$lt": cutoff}, "text_status": {"$ne": "partial"}, "filepath": {"$ne": None}},
+            {"filepath": 1},
+        )
+        for doc in expired:
+            path = doc["filepath"]
+            # PDFs ingested from outside UPLOAD_DIR are not ours to expire
+            if os.path.dirname(os.path.abspath(path)) != os.path.abspath(UPLOAD_DIR):
+                continue
+            db.documents.update_one({"_id": doc["_id"]}, {"$set": {"filepath": None}})
+            if os.path.exists(path):
+                _discard_upload(path)
+                removed += 1
+
+    referenced = {os.path.abspath(p) for p in db.documents.distinct("filepath") if p}
+    referenced |= {
+        os.path.abspath(p)
+        for p in db.jobs.distinct("filepath", {"state": {"$nin": ["done", "failed"]}})
+        if p
+    }
+    min_age = UPLOAD_ORPHAN_HOURS * 3600
+    now = time.time()
+    for entry in os.scandir(UPLOAD_DIR):
+        path = os.path.abspath(entry.path)
+        if not entry.is_file() or path in referenced:
+            continue
+        try:
+            if now - entry.stat().st_mtime < min_age:
+                continue
+            os.unlink(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+def ingest_pdf(
+    file_path: str,
+    original_filename: str | None = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    force: bool = False,
+    content_hash: str | None = None,
+) -> str:
+
+    # A file whose SHA-256 is already stored short-circuits to the existing document id,
+    # and the redundant upload copy is deleted. force=True reprocesses it and replaces the
+    # stored document in place, deleting the upload the old document pointed to.
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} does not exist.")
+
+    db = get_db()
+    dedup.ensure_index(db)
+    content_hash = content_hash or dedup.file_sha256(file_path)
+    existing_id = dedup.find_existing(db, content_hash)
+    if existing_id and not force:
+        dedup.record(hit=True)
+        _discard_upload(file_path, keep=_stored_filepath(db, existing_id))
+        return existing_id
+    dedup.record(hit=False)
+
+    doc = build_document(
+        file_path,
+        original_filename=original_filename,
+        on_stage=on_stage,
+        content_hash=content_hash,
+    )
+    return _store_document(db, doc, existing_id)
+
+def _store_document(db, doc: dict, existing_id: Optional[str]) -> str:
+    if existing_id:
+        old_path = _stored_filepath(db, existing_id)
+        db.documents.replace_one({"_id": ObjectId(existing_id)}, doc)
+        _discard_upload(old_path, keep=doc["filepath"])
+        return existing_id
+    try:
+        return str(db.documents.insert_one(doc).inserted_id)
+    except DuplicateKeyError:
+        # Same file ingested concurrently; keep the copy that won the race
+        existing_id = dedup.find_existing(db, doc["content_hash"])
+        _discard_upload(doc["filepath"], keep=_stored_filepath(db, existing_id))
+        return existing_id
+
+def ingest_pdfs(items: list, force: bool = False, batch_size: int = CLASSIFY_BATCH_SIZE) -> list:
+    """
+    Batched ingest_pdf. items is [(file_path, original_filename, content_hash), ...]
+    (name and hash may be None). Duplicates short-circuit (and their upload copies are
+    deleted) as in ingest_pdf; the rest go through build_documents.
+    Returns [(document_id_or_None, error_or_None), ...] in order.
+    """
+    db = get_db()
+    dedup.ensure_index(db)
+    out = [(None, None)] * len(items)
+    todo = []
+    for i, (file_path, original_filename, content_hash) in enumerate(items):
+        try:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File {file_path} does not exist.")
+            content_hash = content_hash or dedup.file_sha256(file_path)
+            existing_id = dedup.find_existing(db, content_hash)
+            if existing_id and not force:
+                dedup.record(hit=True)
+                _discard_upload(file_path, keep=_stored_filepath(db, existing_id))
+                out[i] = (existing_id, None)
+                continue
+            dedup.record(hit=False)
+            todo.append((i, existing_id, (file_path, original_filename, content_hash)))
+        except Exception as e:
+            out[i] = (None, str(e))
+
+    built = build_documents([item for _, _, item in todo], batch_size=batch_size)
+    for (i, existing_id, item), (doc, error) in zip(todo, built):
+        if error:
+            out[i] = (None, error)
+            continue
+        try:
+            out[i] = (_store_document(db, doc, existing_id), None)
+        except Exception as e:
+            out[i] = (None, str(e))
+    return out
+
+def ensure_tables(document_id: str) -> list:
+    """
+    Return the tables for a stored document, extracting them from the original file
+    and caching them on the document the first time they are requested.
+    """
+    db = get_db()
+    doc = db.documents.find_one(
+        {"_id": ObjectId(document_id)},
+        {"filepath": 1, "tables": 1, "tables_status": 1, "content_hash": 1},
+    )
+    if doc is None:
+        raise LookupError(f"Document {document_id} not found")
+    # Documents ingested before tables were deferred have no tables_status
+    if doc.get("tables_status", "done") == "done" and doc.get("tables") is not None:
+        return doc["tables"]
+
+    file_path = doc.get("filepath")
+    if not file_path or not os.path.exists(file_path):
+        raise FileNotFoundError(f"Original file for document {document_id} is no longer available.")
+
+    tables = extract_tables(file_path, file_hash=doc.get("content_hash"))
+    db.documents.update_one(
+        {"_id": doc["_id"]},
+        {"$set": {"tables": tables, "tables_status": "done"}},
+    )
+    return tables
+
+def complete_text(document_id: str) -> bool:
+    """
+    Background stage for page-budgeted documents: parse the pages skipped during
+    ingestion and append them to raw_text. Returns True if the document was updated.
+    """
+    db = get_db()
+    doc = db.documents.find_one(
+        {"_id": ObjectId(document_id)},
+        {"filepath": 1, "raw_text": 1, "pages_parsed": 1, "text_status": 1, "content_hash": 1},
+    )
+    if not doc or doc.get("text_status") != "partial":
+        return False
+
+    pages = extract_pages(
+        doc["filepath"],
+        with_tables=False,
+        first_page=doc.get("pages_parsed", 0),
+        file_hash=doc.get("content_hash"),
+    )
+    rest = [page_text for page_text, _ in pages if page_text]
+    text = "\n".join(([doc["raw_text"]] if doc.get("raw_text") else []) + rest)
+    db.documents.update_one(
+        {"_id": doc["_id"], "text_status": "partial"},
+        {"$set": {
+            "raw_text": text,
+            "pages_parsed": doc.get("pages_parsed", 0) + len(pages),
+            "text_status": "complete",
+        }},
+    )
+    return True
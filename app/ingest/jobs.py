@@ -0,0 +1,256 @@
+# app/ingest/jobs.py
+# Background ingestion jobs: uploads are saved to disk, enqueued, and drained by a
+# bounded worker pool so the API can answer immediately (202 + job id).
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bson import ObjectId
+
+from app.db.mongo import get_db
+from app.ingest.ingest import PAGE_BUDGET, UPLOAD_DIR, complete_text, ingest_pdf, prune_uploads
+
+MAX_WORKERS = int(os.getenv("DOCINTEL_INGEST_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("DOCINTEL_MAX_PENDING_JOBS", "100"))
+# Every API process records itself as the owner of the jobs it runs and refreshes a
+# heartbeat in job_owners; unfinished jobs whose owner stopped beating are failed.
+HEARTBEAT_SECONDS = float(os.getenv("DOCINTEL_JOB_HEARTBEAT_SECONDS", "15"))
+STALE_AFTER_SECONDS = float(os.getenv("DOCINTEL_JOB_STALE_SECONDS", "120"))
+# The heartbeat thread also applies the upload retention policy this often
+PRUNE_UPLOADS_SECONDS = float(os.getenv("DOCINTEL_UPLOAD_PRUNE_SECONDS", "3600"))
+
+JOB_STATES = ("queued", "parsing", "classifying", "extracting", "done", "failed")
+_UNFINISHED_STATES = ("queued", "parsing", "classifying", "extracting")
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+_instance = None
+_heartbeat_thread = None
+_heartbeat_stop = threading.Event()
+_heartbeat_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ingest")
+    return _executor
+
+
+def shutdown(wait: bool = False):
+    """Stop accepting work; called on API shutdown."""
+    global _executor, _heartbeat_thread
+    with _heartbeat_lock:
+        _heartbeat_stop.set()
+        _heartbeat_thread = None
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=not wait)
+            _executor = None
+
+
+def instance_id() -> str:
+    """Owner id of this process (host, pid and a random suffix so a reused pid is not mistaken for it)."""
+    global _instance
+    if _instance is None or _instance[0] != os.getpid():
+        _instance = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _instance[1]
+
+
+def heartbeat():
+    get_db().job_owners.update_one(
+        {"_id": instance_id()},
+        {"$set": {"heartbeat_ts": datetime.now(timezone.utc), "pid": os.getpid()}},
+        upsert=True,
+    )
+
+
+def fail_stale_jobs() -> int:
+    """
+    Mark unfinished jobs whose owner process is gone (no heartbeat for
+    STALE_AFTER_SECONDS, or no owner recorded) as failed and delete their uploads.
+    The queue only lives in memory, so nothing will ever pick them up again. Jobs of
+    other live processes are left alone. Returns how many jobs were failed.
+    """
+    db = get_db()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=STALE_AFTER_SECONDS)
+    live = [instance_id()] + [
+        owner["_id"] for owner in db.job_owners.find({"heartbeat_ts": {"$gte": cutoff}}, {"_id": 1})
+    ]
+    stale = list(db.jobs.find(
+        {"state": {"$in": list(_UNFINISHED_STATES)}, "owner": {"$nin": live}}, {"filepath": 1}
+    ))
+    failed = 0
+    for job in stale:
+        # Only the sweep that actually flips the state removes the file
+        result = db.jobs.update_one(
+            {"_id": job["_id"], "state": {"$in": list(_UNFINISHED_STATES)}},
+            {"$set": {
+                "state": "failed",
+                "error": "Interrupted by an API restart; please upload again",
+                "updated_ts": datetime.now(timezone.utc),
+            }},
+        )
+        if result.modified_count:
+            _remove_upload(job.get("filepath"))
+            failed += 1
+    db.job_owners.delete_many({"heartbeat_ts": {"$lt": cutoff}})
+    return failed
+
+
+def _heartbeat_loop():
+    last_prune = None
+    while True:
+        try:
+            heartbeat()
+            count = fail_stale_jobs()
+            if count:
+                print(f"[jobs] marked {count} interrupted job(s) as failed")
+        except Exception as e:
+            print(f"[jobs] heartbeat failed: {e}")
+        if last_prune is None or time.monotonic() - last_prune >= PRUNE_UPLOADS_SECONDS:
+            last_prune = time.monotonic()
+            try:
+                count = prune_uploads()
+                if count:
+                    print(f"[jobs] deleted {count} expired upload(s)")
+            except Exception as e:
+                print(f"[jobs] pruning uploads failed: {e}")
+        if _heartbeat_stop.wait(HEARTBEAT_SECONDS):
+            return
+
+
+def start_heartbeat():
+    """Start refreshing this process's heartbeat and sweeping stale jobs; safe to call more than once."""
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_stop.clear()
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="jobs-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def _remove_upload(path: Optional[str]):
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def new_upload_path(suffix: str = ".pdf") -> str:
+    """Return a fresh path in the upload directory for persisting an incoming file."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}{suffix}")
+
+
+def pending_jobs() -> int:
+    return _pending
+
+
+def _update_job(job_id: ObjectId, **fields):
+    fields["updated_ts"] = datetime.now(timezone.utc)
+    get_db().jobs.update_one({"_id": job_id}, {"$set": fields})
+
+
+def _run_job(job_id: ObjectId, file_path: str, original_filename: str, enqueued_at: float,
+             force: bool, content_hash: Optional[str]):
+    global _pending
+    timings = {"queued": round(time.perf_counter() - enqueued_at, 3)}
+    current = {"stage": None, "t0": None}
+
+    def _close_stage():
+        if current["stage"]:
+            timings[current["stage"]] = round(time.perf_counter() - current["t0"], 3)
+
+    def on_stage(stage: str):
+        _close_stage()
+        current["stage"], current["t0"] = stage, time.perf_counter()
+        _update_job(job_id, state=stage, timings=timings)
+
+    try:
+        document_id = ingest_pdf(
+            file_path,
+            original_filename=original_filename,
+            on_stage=on_stage,
+            force=force,
+            content_hash=content_hash,
+        )
+        _close_stage()
+        _update_job(job_id, state="done", timings=timings, document_id=document_id)
+        if PAGE_BUDGET:
+            # Results are already available; parse the remaining pages afterwards
+            _get_executor().submit(_complete_text, document_id)
+    except Exception as e:
+        _close_stage()
+        print(f"[jobs] ingest job {job_id} failed: {e}")
+        _remove_upload(file_path)
+        _update_job(job_id, state="failed", timings=timings, error=str(e))
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def _complete_text(document_id: str):
+    try:
+        complete_text(document_id)
+    except Exception as e:
+        print(f"[jobs] completing text for document {document_id} failed: {e}")
+
+
+def enqueue_ingest(file_path: str, original_filename: Optional[str] = None, force: bool = False,
+                   content_hash: Optional[str] = None) -> str:
+    """
+    Record a queued ingestion job for an already persisted file and hand it to the
+    worker pool. Returns the job id. Raises QueueFullError when too many jobs are pending.
+    content_hash (SHA-256 hex) can be passed when already computed, e.g. while streaming the upload.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= MAX_PENDING:
+            raise QueueFullError(f"Too many pending ingestion jobs ({_pending})")
+        _pending += 1
+
+    start_heartbeat()
+    filename = original_filename or os.path.basename(file_path)
+    now = datetime.now(timezone.utc)
+    job = {
+        "filename": filename,
+        "filepath": file_path,
+        "owner": instance_id(),
+        "state": "queued",
+        "created_ts": now,
+        "updated_ts": now,
+        "timings": {},
+        "document_id": None,
+        "error": None,
+    }
+    try:
+        job_id = get_db().jobs.insert_one(job).inserted_id
+        _get_executor().submit(_run_job, job_id, file_path, filename, time.perf_counter(), force, content_hash)
+    except Exception:
+        with _pending_lock:
+            _pending -= 1
+        raise
+    return str(job_id)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    job = get_db().jobs.find_one({"_id": ObjectId(job_id)})
+    if job:
+        job["id"] = str(job.pop("_id"))
+    return job
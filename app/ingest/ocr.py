@@ -0,0 +1,162 @@
+# app/ingest/ocr.py
+# OCR for scanned pages: only pages without a usable text layer are rasterized
+# (pdfplumber's bundled pdfium renderer) and OCR'd (pytesseract/tesseract) in a process pool.
+# Results are cached on disk by page hash, so re-ingesting the same scan is free.
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterable, Optional
+
+import pdfplumber
+from pdfminer.pdftypes import resolve1, stream_value
+
+OCR_ENABLED = os.getenv("DOCINTEL_OCR", "1") != "0"
+# Pages whose extracted text is shorter than this are treated as scanned
+OCR_MIN_CHARS = int(os.getenv("DOCINTEL_OCR_MIN_CHARS", "25"))
+OCR_DPI = int(os.getenv("DOCINTEL_OCR_DPI", "300"))
+OCR_LANG = os.getenv("DOCINTEL_OCR_LANG", "eng")
+OCR_WORKERS = int(os.getenv("DOCINTEL_OCR_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+OCR_CACHE_DIR = os.getenv(
+    "DOCINTEL_OCR_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "docintel", "ocr"),
+)
+
+_available = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ocr_available() -> bool:
+    """True when pytesseract is installed and the tesseract binary is on PATH."""
+    global _available
+    if _available is None:
+        try:
+            import pytesseract
+            _available = shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+        except ImportError:
+            _available = False
+        if not _available:
+            print("[ocr] tesseract not available; scanned pages will have no text")
+    return _available
+
+
+def needs_ocr(text: str) -> bool:
+    return len((text or "").strip()) < OCR_MIN_CHARS
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking the multi-threaded API process is unsafe
+                _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    """Stop the OCR worker processes; called on API shutdown."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def page_hash(page) -> Optional[str]:
+    """
+    Fingerprint of what is drawn on a pdfplumber page: its content streams plus the
+    data of every image on it, so the same scan hashes the same in any file. Decoded
+    data is hashed because pdfminer drops a stream's raw bytes once it is parsed.
+    OCR settings are included so changing DPI/language does not reuse stale text.
+    Returns None (no cache key) when a stream cannot be resolved.
+    """
+    h = hashlib.sha256(f"{OCR_DPI}:{OCR_LANG}".encode())
+    try:
+        # pdfminer resolves a /Contents array but leaves its entries as PDFObjRef
+        for stream in resolve1(page.page_obj.contents) or []:
+            h.update(stream_value(stream).get_data() or b"")
+        for image in page.images:
+            h.update(stream_value(image["stream"]).get_data() or b"")
+    except Exception as e:
+        print(f"[ocr] could not hash page {page.page_number}: {e}")
+        return None
+    return h.hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def _cache_get(key: str):
+    path = _cache_path(key)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def _cache_put(key: str, text: str):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _ocr_page(file_path: str, page_index: int, dpi: int, lang: str) -> str:
+    # Runs in a worker process: rasterize just this page and OCR it
+    import pytesseract
+
+    with pdfplumber.open(file_path) as pdf:
+        image = pdf.pages[page_index].to_image(resolution=dpi).original
+    return pytesseract.image_to_string(image, lang=lang).strip()
+
+
+def ocr_pages(file_path: str, page_indices: Iterable[int]) -> Dict[int, str]:
+    """
+    OCR the given (0-based) pages of a PDF. Returns {page_index: text}; empty when OCR
+    is disabled or unavailable. Cached pages are not rasterized again.
+    """
+    page_indices = sorted(set(page_indices))
+    if not page_indices or not OCR_ENABLED or not ocr_available():
+        return {}
+
+    with pdfplumber.open(file_path) as pdf:
+        keys = {i: page_hash(pdf.pages[i]) for i in page_indices}
+
+    results = {}
+    todo = []
+    for i, key in keys.items():
+        cached = _cache_get(key) if key else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            todo.append(i)
+
+    if len(todo) > 1 and OCR_WORKERS > 1:
+        pool = _get_pool()
+        futures = {i: pool.submit(_ocr_page, file_path, i, OCR_DPI, OCR_LANG) for i in todo}
+        outputs = {}
+        for i, fut in futures.items():
+            try:
+                outputs[i] = fut.result()
+            except Exception as e:
+                print(f"[ocr] page {i + 1} of {file_path} failed: {e}")
+    else:
+        outputs = {}
+        for i in todo:
+            try:
+                outputs[i] = _ocr_page(file_path, i, OCR_DPI, OCR_LANG)
+            except Exception as e:
+                print(f"[ocr] page {i + 1} of {file_path} failed: {e}")
+
+    for i, text in outputs.items():
+        if keys[i]:
+            _cache_put(keys[i], text)
+        results[i] = text
+    return results
@@ -0,0 +1,192 @@
+# app/ingest/page_cache.py
+# Persistent cache of extracted page text/tables, keyed by (file SHA-256, page index,
+# extraction settings version), so re-running ingestion or evaluation over the same
+# PDFs does not re-parse them. Stored in a local SQLite file with size-based LRU eviction.
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PAGE_CACHE_ENABLED = os.getenv("DOCINTEL_PAGE_CACHE", "1") != "0"
+PAGE_CACHE_PATH = os.getenv(
+    "DOCINTEL_PAGE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "docintel", "pages.sqlite3"),
+)
+PAGE_CACHE_MAX_MB = int(os.getenv("DOCINTEL_PAGE_CACHE_MAX_MB", "512"))
+
+# Bump when page extraction changes in a way that invalidates cached output
+_EXTRACTION_VERSION = "1"
+
+_init_lock = threading.Lock()
+_initialized = False
+_settings = None
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def settings_version() -> str:
+    """Everything that changes what a page extracts to: pdfplumber and OCR settings."""
+    global _settings
+    if _settings is None:
+        import pdfplumber
+        from app.ingest import ocr
+
+        ocr_settings = (
+            f"{ocr.OCR_MIN_CHARS}:{ocr.OCR_DPI}:{ocr.OCR_LANG}"
+            if ocr.OCR_ENABLED and ocr.ocr_available() else "off"
+        )
+        _settings = f"v{_EXTRACTION_VERSION}|pdfplumber={pdfplumber.__version__}|ocr={ocr_settings}"
+    return _settings
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    os.makedirs(os.path.dirname(os.path.abspath(PAGE_CACHE_PATH)), exist_ok=True)
+    conn = sqlite3.connect(PAGE_CACHE_PATH, timeout=30)
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS files ("
+                    " file_hash TEXT NOT NULL, settings TEXT NOT NULL, page_count INTEGER NOT NULL,"
+                    " PRIMARY KEY (file_hash, settings))"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS pages ("
+                    " file_hash TEXT NOT NULL, page_index INTEGER NOT NULL, settings TEXT NOT NULL,"
+                    " text TEXT, tables TEXT, size INTEGER NOT NULL, last_access REAL NOT NULL,"
+                    " PRIMARY KEY (file_hash, page_index, settings))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+                conn.commit()
+                _initialized = True
+    return conn
+
+
+@contextmanager
+def _db():
+    # One short-lived connection per operation: safe across threads and processes
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def get_page_count(file_hash: str, settings: str) -> Optional[int]:
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT page_count FROM files WHERE file_hash = ? AND settings = ?", (file_hash, settings)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def get_pages(file_hash: str, settings: str, page_indices: Iterable[int],
+              with_text: bool, with_tables: bool) -> Dict[int, Tuple[str, list]]:
+    """
+    Return {page_index: (text, tables)} for the requested pages that are cached with
+    everything asked for (text and/or tables). Fields not asked for come back empty.
+    """
+    page_indices = list(page_indices)
+    if not page_indices:
+        return {}
+    found = {}
+    with _db() as conn:
+        for start in range(0, len(page_indices), 500):
+            chunk = page_indices[start:start + 500]
+            rows = conn.execute(
+                f"SELECT page_index, text, tables FROM pages WHERE file_hash = ? AND settings = ?"
+                f" AND page_index IN ({','.join('?' * len(chunk))})",
+                [file_hash, settings, *chunk],
+            ).fetchall()
+            for page_index, text, tables in rows:
+                if (with_text and text is None) or (with_tables and tables is None):
+                    continue
+                found[page_index] = (
+                    text if with_text else "",
+                    json.loads(tables) if with_tables else [],
+                )
+        if found:
+            conn.executemany(
+                "UPDATE pages SET last_access = ? WHERE file_hash = ? AND page_index = ? AND settings = ?",
+                [(time.time(), file_hash, i, settings) for i in found],
+            )
+    with _stats_lock:
+        _stats["hits"] += len(found)
+        _stats["misses"] += len(page_indices) - len(found)
+    return found
+
+
+def put_pages(file_hash: str, settings: str, page_count: int, first_page: int,
+              results: List[Tuple[str, list]], with_text: bool, with_tables: bool):
+    """Store extracted pages; fields that were not extracted keep any cached value."""
+    now = time.time()
+    rows = []
+    for offset, (text, tables) in enumerate(results):
+        text_val = text if with_text else None
+        tables_val = json.dumps(tables) if with_tables else None
+        size = len(text_val or "") + len(tables_val or "")
+        rows.append((file_hash, first_page + offset, settings, text_val, tables_val, size, now))
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO files (file_hash, settings, page_count) VALUES (?, ?, ?)",
+            (file_hash, settings, page_count),
+        )
+        conn.executemany(
+            "INSERT INTO pages (file_hash, page_index, settings, text, tables, size, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (file_hash, page_index, settings) DO UPDATE SET"
+            "  text = COALESCE(excluded.text, pages.text),"
+            "  tables = COALESCE(excluded.tables, pages.tables),"
+            "  size = LENGTH(COALESCE(excluded.text, pages.text, ''))"
+            "       + LENGTH(COALESCE(excluded.tables, pages.tables, '')),"
+            "  last_access = excluded.last_access",
+            rows,
+        )
+        _evict(conn)
+
+
+def _evict(conn: sqlite3.Connection):
+    # Drop least recently used pages until the cache is back under 90% of its budget
+    max_bytes = PAGE_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+    if total <= max_bytes:
+        return
+    target = int(max_bytes * 0.9)
+    evicted = 0
+    for file_hash, page_index, settings, size in conn.execute(
+        "SELECT file_hash, page_index, settings, size FROM pages ORDER BY last_access"
+    ).fetchall():
+        if total <= target:
+            break
+        conn.execute(
+            "DELETE FROM pages WHERE file_hash = ? AND page_index = ? AND settings = ?",
+            (file_hash, page_index, settings),
+        )
+        total -= size
+        evicted += 1
+    # A file entry without pages only costs a lookup; drop them anyway to keep the table small
+    conn.execute(
+        "DELETE FROM files WHERE NOT EXISTS ("
+        " SELECT 1 FROM pages WHERE pages.file_hash = files.file_hash AND pages.settings = files.settings)"
+    )
+    with _stats_lock:
+        _stats["evictions"] += evicted
+
+
+def stats() -> dict:
+    with _stats_lock:
+        hits, misses, evictions = _stats["hits"], _stats["misses"], _stats["evictions"]
+    total = hits + misses
+    return {
+        "enabled": PAGE_CACHE_ENABLED,
+        "page_hits": hits,
+        "page_misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "evicted_pages": evictions,
+    }
@@ -0,0 +1,210 @@
+# app/ingest/pages.py
+# Page-level PDF extraction. Long PDFs can be split into page ranges that are parsed
+# in worker processes (each opens the file itself) and reassembled in page order.
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional, Tuple
+
+import pdfplumber
+
+from app.ingest import page_cache
+from app.ingest.dedup import file_sha256
+from app.ingest.ocr import needs_ocr, ocr_pages
+
+PAGE_PARALLEL = os.getenv("DOCINTEL_PAGE_PARALLEL", "0") != "0"
+PAGE_PARALLEL_MIN_PAGES = int(os.getenv("DOCINTEL_PAGE_PARALLEL_MIN_PAGES", "30"))
+PAGE_WORKERS = int(os.getenv("DOCINTEL_PAGE_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+# Table detection is expensive and no extractor reads tables, so by default it is
+# deferred until someone asks for them (GET /document/{id}/tables).
+EXTRACT_TABLES = os.getenv("DOCINTEL_EXTRACT_TABLES", "0") != "0"
+
+# (text, tables) for one page; text is "" when the page has no text layer and
+# tables is [] when table extraction was skipped
+PageResult = Tuple[str, list]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking the multi-threaded API process is unsafe
+                _pool = ProcessPoolExecutor(max_workers=PAGE_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    """Stop the page worker processes; called on API shutdown."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_page(page, with_text: bool = True, with_tables: bool = True) -> PageResult:
+    text = (page.extract_text() or "") if with_text else ""
+    tables = (page.extract_tables() or []) if with_tables else []
+    return text, tables
+
+
+def _extract_range(file_path: str, start: int, end: int,
+                   with_text: bool = True, with_tables: bool = True) -> List[PageResult]:
+    with pdfplumber.open(file_path) as pdf:
+        return [_extract_page(pdf.pages[i], with_text, with_tables) for i in range(start, end)]
+
+
+def _split(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def extract_pages(file_path: str, parallel: Optional[bool] = None,
+                  with_tables: Optional[bool] = None, with_text: bool = True,
+                  first_page: int = 0, file_hash: Optional[str] = None) -> List[PageResult]:
+    """
+    Return [(text, tables), ...] for every page from first_page on, in page order.
+    parallel=None follows DOCINTEL_PAGE_PARALLEL; either way PDFs shorter than
+    DOCINTEL_PAGE_PARALLEL_MIN_PAGES are parsed serially in this process.
+    with_tables=None follows DOCINTEL_EXTRACT_TABLES.
+    Pages without a usable text layer are OCR'd (see app/ingest/ocr.py), and results
+    are served from / stored in the page cache (see app/ingest/page_cache.py);
+    pass file_hash (SHA-256 hex) when already known to avoid hashing the file again.
+    """
+    if parallel is None:
+        parallel = PAGE_PARALLEL
+    if with_tables is None:
+        with_tables = EXTRACT_TABLES
+
+    if page_cache.PAGE_CACHE_ENABLED:
+        file_hash = file_hash or file_sha256(file_path)
+        settings = page_cache.settings_version()
+        page_count = page_cache.get_page_count(file_hash, settings)
+        if page_count is not None:
+            wanted = range(first_page, page_count)
+            cached = page_cache.get_pages(file_hash, settings, wanted, with_text, with_tables)
+            if len(cached) == len(wanted):
+                return [cached[i] for i in wanted]
+
+    results = _read_pages(file_path, parallel, with_tables, with_text, first_page)
+    if with_text:
+        scanned = [first_page + i for i, (text, _) in enumerate(results) if needs_ocr(text)]
+        for page_index, text in ocr_pages(file_path, scanned).items():
+            results[page_index - first_page] = (text, results[page_index - first_page][1])
+
+    if page_cache.PAGE_CACHE_ENABLED:
+        page_cache.put_pages(
+            file_hash, settings, first_page + len(results), first_page, results, with_text, with_tables
+        )
+    return results
+
+
+def extract_text(file_path: str, parallel: Optional[bool] = None, file_hash: Optional[str] = None) -> str:
+    """Full text of a PDF (pages joined by newlines), without tables."""
+    pages = extract_pages(file_path, parallel=parallel, with_tables=False, file_hash=file_hash)
+    return "\n".join(page_text for page_text, _ in pages if page_text)
+
+
+def _read_pages(file_path: str, parallel: bool, with_tables: bool, with_text: bool,
+                first_page: int) -> List[PageResult]:
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+        if not parallel or PAGE_WORKERS < 2 or page_count - first_page < PAGE_PARALLEL_MIN_PAGES:
+            return [_extract_page(page, with_text, with_tables) for page in pdf.pages[first_page:]]
+
+    # A few more ranges than workers evens out pages that are much slower than others
+    ranges = [
+        (first_page + start, first_page + end)
+        for start, end in _split(page_count - first_page, PAGE_WORKERS * 2)
+    ]
+    pool = _get_pool()
+    futures = [
+        pool.submit(_extract_range, file_path, start, end, with_text, with_tables)
+        for start, end in ranges
+    ]
+    results = []
+    for fut in futures:
+        results.extend(fut.result())
+    return results
+
+
+def extract_tables(file_path: str, parallel: Optional[bool] = None, file_hash: Optional[str] = None) -> list:
+    """Tables only (each table = list of rows), for documents ingested without them."""
+    pages = extract_pages(file_path, parallel=parallel, with_tables=True, with_text=False, file_hash=file_hash)
+    return [table for _, page_tables in pages for table in page_tables]
+
+
+class LeadingPageText:
+    """
+    Reads page text one page at a time so ingestion can stop as soon as it has
+    enough text for classification/extraction (see DOCINTEL_PAGE_BUDGET).
+
+        with LeadingPageText(path) as reader:
+            reader.read_until(1500)
+            ...
+            reader.read_until(4000)
+            text = reader.text
+    """
+
+    def __init__(self, file_path: str, file_hash: Optional[str] = None):
+        self.file_path = file_path
+        self._pdf = pdfplumber.open(file_path)
+        self.page_count = len(self._pdf.pages)
+        if page_cache.PAGE_CACHE_ENABLED:
+            self._file_hash = file_hash or file_sha256(file_path)
+            self._settings = page_cache.settings_version()
+        self.pages_read = 0
+        self._parts = []
+        self._chars = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pdf.close()
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self._parts)
+
+    @property
+    def complete(self) -> bool:
+        return self.pages_read >= self.page_count
+
+    def read_until(self, min_chars: int):
+        """Parse further pages until min_chars whitespace-collapsed characters are available."""
+        while self._chars < min_chars and not self.complete:
+            page_text = self._read_page(self.pages_read)
+            self.pages_read += 1
+            if page_text:
+                self._parts.append(page_text)
+                self._chars += len(re.sub(r"\s+", " ", page_text))
+
+    def _read_page(self, index: int) -> str:
+        if page_cache.PAGE_CACHE_ENABLED:
+            cached = page_cache.get_pages(self._file_hash, self._settings, [index], True, False)
+            if index in cached:
+                return cached[index][0]
+        page_text = self._pdf.pages[index].extract_text() or ""
+        if needs_ocr(page_text):
+            page_text = ocr_pages(self.file_path, [index]).get(index, page_text)
+        if page_cache.PAGE_CACHE_ENABLED:
+            page_cache.put_pages(
+                self._file_hash, self._settings, self.page_count, index, [(page_text, [])], True, False
+            )
+        return page_text
@@ -1,44 +1,459 @@
 # trying to see how well classifying using keywords works
+#   python evaluate_classifier.py [--workers N] [--json report.json]  # accuracy, per-stage timing
+#   python evaluate_classifier.py --tiers [fast ...]                  # accuracy/latency/memory per model tier
+#   python evaluate_classifier.py --calibrate                         # tune zero-shot thresholds
+# Text is extracted in parallel once and kept in a corpus cache (keyed by file SHA-256),
+# so later runs only time the classifiers.
+import argparse
+import json
 import os
-from app.classify.classifier import classify_text
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.classify.classifier import (
+    THRESHOLDS_PATH, classify_text, classify_text_ai, classify_text_rule, load_thresholds,
+)
+from app.classify import fast_classifier
+from app.classify.fast_classifier import classify_text_fast, iter_dataset
+from app.inference import result_cache
+from app.ingest.dedup import file_sha256
+from app.ingest.pages import extract_text
 
 DATASET_DIR = "data/provided_dataset"
+CORPUS_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "docintel", "eval_corpus.json")
+SCORE_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "docintel", "eval_scores.json")
+PERCENTILES = (50, 90, 95, 99)
 
-def main():
-    correct = 0
-    total = 0
-    results = {}
+def _parse(file_path: str):
+    # Runs in a worker process
+    t0 = time.perf_counter()
+    text = extract_text(file_path)
+    return text, time.perf_counter() - t0
 
-    for folder in os.listdir(DATASET_DIR):
-        folder_path = os.path.join(DATASET_DIR, folder)
-        if not os.path.isdir(folder_path):
-            continue
+def load_corpus(dataset_dir: str = DATASET_DIR, workers: int = None, cache_path: str = CORPUS_CACHE) -> list:
+    """
+    [{"path", "label", "text", "parse_seconds", "cached"}] for the dataset. Texts come from
+    the corpus cache when the file hash matches; the rest are extracted in a process pool.
+    """
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
 
-        true_label = folder.lower().replace(" ", "_") 
-        results[true_label] = {"correct": 0, "total": 0}
+    corpus, todo = [], []
+    for file_path, label in iter_dataset(dataset_dir):
+        file_hash = file_sha256(file_path)
+        doc = {"path": file_path, "label": label, "hash": file_hash}
+        if file_hash in cache:
+            doc.update(text=cache[file_hash]["text"], parse_seconds=cache[file_hash]["parse_seconds"], cached=True)
+        else:
+            todo.append(doc)
+        corpus.append(doc)
 
-        for filename in os.listdir(folder_path):
-            if not filename.endswith(".pdf"):
-                continue
-            file_path = os.path.join(folder_path, filename)
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for doc, (text, seconds) in zip(todo, pool.map(_parse, [d["path"] for d in todo])):
+                doc.update(text=text, parse_seconds=seconds, cached=False)
+                cache[doc["hash"]] = {"text": text, "parse_seconds": seconds}
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            with open(cache_path, "w") as f:
+                json.dump(cache, f)
+    return corpus
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+def _summary(seconds: list) -> dict:
+    out = {f"p{pct}_ms": round(_percentile(seconds, pct) * 1000, 3) for pct in PERCENTILES}
+    out["mean_ms"] = round(sum(seconds) / len(seconds) * 1000, 3) if seconds else 0.0
+    return out
+
+def evaluate(corpus: list, use_ai: bool, folds: int = 3) -> dict:
+    """
+    Run every stage (fast tier, zero-shot, rules) on every document, timing each, and
+    combine them the way classify_text does: fast tier if confident, else AI, else rules.
+    The saved fast-tier model was trained on this dataset, so it is only used for timing;
+    its labels come from out-of-fold (cross-validated) predictions. The result cache is
+    off while measuring so every zero-shot call runs the model.
+    """
+    cache_enabled = result_cache.RESULT_CACHE_ENABLED
+    result_cache.RESULT_CACHE_ENABLED = False
+    try:
+        return _evaluate(corpus, use_ai, folds)
+    finally:
+        result_cache.RESULT_CACHE_ENABLED = cache_enabled
 
-            # For evaluation, just read raw text quickly
-            import pdfplumber
-            with pdfplumber.open(file_path) as pdf:
-                text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+def _evaluate(corpus: list, use_ai: bool, folds: int) -> dict:
+    labels = sorted({doc["label"] for doc in corpus}) + ["unknown"]
+    stage_seconds = {"parse": [doc["parse_seconds"] for doc in corpus], "fast": [], "ai": [], "rules": []}
+    stage_correct = {"fast": 0, "ai": 0, "rules": 0}
+    confusion = {t: {p: 0 for p in labels} for t in labels}
+    documents = []
 
-            predicted = classify_text(text)
+    # Load models before timing so the first document is not charged for it
+    classify_text_fast("warmup")
+    threshold, label_thresholds = load_thresholds()
+    if use_ai:
+        classify_text_ai("This document is used to warm up the classifier.")
 
-            total += 1
-            results[true_label]["total"] += 1
-            if predicted == true_label:
-                correct += 1
-                results[true_label]["correct"] += 1
+    # The fast tier only answers when a saved model is in use, as in classify_text
+    fast_active = fast_classifier.FAST_TIER_ENABLED and fast_classifier.load_model() is not None
+    if fast_active:
+        cv_labels, cv_margins, _ = fast_classifier.cross_val_predict(
+            [doc["text"] for doc in corpus], [doc["label"] for doc in corpus], folds=folds
+        )
 
-    print(f"Overall accuracy: {correct}/{total} = {correct/total:.2%}")
-    for label, r in results.items():
+    for n, doc in enumerate(corpus):
+        text, truth = doc["text"], doc["label"]
+        _, fast_s = _timed(classify_text_fast, text)
+        stage_seconds["fast"].append(fast_s)
+        fast_label, margin = None, 0.0
+        if fast_active:
+            margin = cv_margins[n]
+            fast_label = cv_labels[n] if margin >= fast_classifier.FAST_MARGIN else None
+        ai_label, scores = "unknown", {}
+        if use_ai:
+            (ai_label, _, scores), ai_s = _timed(classify_text_ai, text, threshold, label_thresholds)
+            stage_seconds["ai"].append(ai_s)
+        rules_label, rules_s = _timed(classify_text_rule, text)
+        stage_seconds["rules"].append(rules_s)
+
+        predicted = fast_label or (ai_label if ai_label != "unknown" else rules_label)
+        stage_correct["fast"] += fast_label == truth
+        stage_correct["ai"] += ai_label == truth
+        stage_correct["rules"] += rules_label == truth
+        confusion[truth][predicted if predicted in confusion else "unknown"] += 1
+        documents.append({
+            "path": doc["path"], "label": truth, "predicted": predicted,
+            "fast": fast_label, "fast_margin": round(margin, 4), "ai": ai_label, "ai_scores": scores,
+            "rules": rules_label,
+        })
+
+    total = len(corpus)
+    correct = sum(d["predicted"] == d["label"] for d in documents)
+    per_label = {}
+    for label in labels[:-1]:
+        docs = [d for d in documents if d["label"] == label]
+        per_label[label] = {"correct": sum(d["predicted"] == label for d in docs), "total": len(docs)}
+    return {
+        "documents": total,
+        "use_ai": use_ai,
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "per_label": per_label,
+        # Fast-tier labels (and so overall accuracy) are cross-validated
+        "fast_cv_folds": folds if fast_active else None,
+        "stage_accuracy": {
+            "fast_answered": sum(1 for d in documents if d["fast"]),
+            "fast": round(stage_correct["fast"] / total, 4),
+            "ai": round(stage_correct["ai"] / total, 4) if use_ai else None,
+            "rules": round(stage_correct["rules"] / total, 4),
+        },
+        "corpus_cached": sum(doc["cached"] for doc in corpus),
+        "stage_latency": {stage: _summary(sec) for stage, sec in stage_seconds.items() if sec},
+        "confusion": confusion,
+        "per_document": documents,
+    }
+
+def print_report(report: dict):
+    total = report["documents"]
+    correct = sum(r["correct"] for r in report["per_label"].values())
+    print(f"Overall accuracy: {correct}/{total} = {report['accuracy']:.2%}")
+    for label, r in report["per_label"].items():
         acc = r["correct"] / r["total"] if r["total"] else 0
         print(f"{label}: {r['correct']}/{r['total']} = {acc:.2%}")
 
+    stages = report["stage_accuracy"]
+    folds = report.get("fast_cv_folds")
+    fast_note = f"{folds}-fold cross-validated, " if folds else ""
+    print(f"\nStage accuracy: fast {stages['fast']:.2%} ({fast_note}{stages['fast_answered']} answered), "
+          f"ai {'-' if stages['ai'] is None else format(stages['ai'], '.2%')}, rules {stages['rules']:.2%}")
+    print(f"Corpus: {report['corpus_cached']}/{total} texts from cache")
+
+    print(f"\n{'stage':<7}" + "".join(f"{f'p{p} ms':>11}" for p in PERCENTILES) + f"{'mean ms':>11}")
+    for stage, summary in report["stage_latency"].items():
+        print(f"{stage:<7}" + "".join(f"{summary[f'p{p}_ms']:>11.2f}" for p in PERCENTILES) + f"{summary['mean_ms']:>11.2f}")
+
+    labels = list(report["confusion"])
+    short = [label.split("_")[0][:10] for label in labels]
+    print("\nConfusion matrix (rows = true, columns = predicted):")
+    print(f"{'':<22}" + "".join(f"{s:>12}" for s in short))
+    for label in labels:
+        row = report["confusion"][label]
+        print(f"{label:<22}" + "".join(f"{row[p]:>12}" for p in labels))
+
+def main(workers: int = None, json_path: str = None, refresh: bool = False):
+    if refresh and os.path.exists(CORPUS_CACHE):
+        os.remove(CORPUS_CACHE)
+    corpus = load_corpus(DATASET_DIR, workers=workers)
+    report = evaluate(corpus, use_ai=os.getenv("DOCINTEL_AI", "1") != "0")
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+def load_score_matrix(corpus: list, cache_path: str = SCORE_CACHE):
+    """
+    (n_docs x n_labels score matrix, label keys) from the zero-shot model. Each document's
+    score vector is computed once per model/backend and kept in a cache file, so
+    threshold sweeps never re-run the model.
+    """
+    from app.classify import ai_classifier
+    from app.inference import backends
+
+    label_keys = [key for key, _ in ai_classifier._LABELS]
+    model_key = f"{ai_classifier._MODEL_NAME}|{backends.INFERENCE_BACKEND}"
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    todo = [doc for doc in corpus if f"{model_key}|{doc['hash']}" not in cache]
+    if todo:
+        print(f"Scoring {len(todo)} documents with {ai_classifier._MODEL_NAME} ...")
+        for doc, (_, _, scores) in zip(todo, ai_classifier.classify_texts_ai([d["text"] for d in todo])):
+            cache[f"{model_key}|{doc['hash']}"] = [scores.get(key, 0.0) for key in label_keys]
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            with open(cache_path, "w") as f:
+                json.dump(cache, f)
+    return np.array([cache[f"{model_key}|{doc['hash']}"] for doc in corpus], dtype=float), label_keys
+
+def _sweep(best, accepted_correct, fallback_correct, fallback_unknown, grid):
+    # Rows = documents, columns = candidate thresholds
+    accept = best[:, None] >= grid[None, :]
+    correct = np.where(accept, accepted_correct[:, None], fallback_correct[:, None])
+    return {
+        "accuracy": correct.mean(axis=0),
+        "escalation_rate": (~accept).mean(axis=0),
+        "unknown_rate": (~accept & fallback_unknown[:, None]).mean(axis=0),
+    }
+
+def _pick(accuracy, grid, prefer: float) -> float:
+    # Highest accuracy; among ties the threshold closest to the current one
+    tied = np.flatnonzero(accuracy >= accuracy.max() - 1e-12)
+    return float(grid[tied[np.argmin(np.abs(grid[tied] - prefer))]])
+
+def calibrate(corpus: list, json_path: str = None, out_path: str = THRESHOLDS_PATH, rounds: int = 3) -> dict:
+    """
+    Sweep the zero-shot acceptance threshold over cached score vectors: below it a
+    document escalates to the rules classifier. Picks a global threshold, then refines
+    per-label thresholds by coordinate ascent, and writes them for classify_text.
+    """
+    from app.classify import ai_classifier
+
+    scores, label_keys = load_score_matrix(corpus)
+    truth = np.array([label_keys.index(doc["label"]) if doc["label"] in label_keys else -1 for doc in corpus])
+    rules = [classify_text_rule(doc["text"]) for doc in corpus]
+    best, argbest = scores.max(axis=1), scores.argmax(axis=1)
+    accepted_correct = argbest == truth
+    fallback_correct = np.array([r == doc["label"] for r, doc in zip(rules, corpus)])
+    fallback_unknown = np.array([r == "unknown" for r in rules])
+    grid = np.round(np.linspace(0.0, 1.0, 101), 2)
+
+    current, _ = load_thresholds()
+    curves = _sweep(best, accepted_correct, fallback_correct, fallback_unknown, grid)
+    global_threshold = _pick(curves["accuracy"], grid, prefer=current)
+
+    # Per-label: a document's threshold is that of its top-scoring label, so each label's
+    # threshold only moves the documents whose argmax is that label
+    per_label = np.full(len(label_keys), global_threshold)
+    for _ in range(rounds):
+        changed = False
+        for j in range(len(label_keys)):
+            mine = argbest == j
+            if not mine.any():
+                continue
+            others = ~mine
+            others_correct = np.where(
+                best[others] >= per_label[argbest[others]], accepted_correct[others], fallback_correct[others]
+            ).sum()
+            label_curve = _sweep(best[mine], accepted_correct[mine], fallback_correct[mine], fallback_unknown[mine], grid)
+            accuracy = (label_curve["accuracy"] * mine.sum() + others_correct) / len(corpus)
+            choice = _pick(accuracy, grid, prefer=per_label[j])
+            changed |= choice != per_label[j]
+            per_label[j] = choice
+        if not changed:
+            break
+
+    def _apply(thresholds):
+        accept = best >= thresholds[argbest]
+        return {
+            "accuracy": float(np.where(accept, accepted_correct, fallback_correct).mean()),
+            "escalation_rate": float((~accept).mean()),
+            "unknown_rate": float((~accept & fallback_unknown).mean()),
+        }
+
+    idx = {round(float(t), 2): i for i, t in enumerate(grid)}
+    report = {
+        "documents": len(corpus),
+        "model": ai_classifier._MODEL_NAME,
+        "current": {"threshold": current, **_apply(np.full(len(label_keys), current))},
+        "global": {"threshold": global_threshold, **_apply(np.full(len(label_keys), global_threshold))},
+        "per_label": {
+            "label_thresholds": dict(zip(label_keys, per_label.tolist())),
+            **_apply(per_label),
+        },
+        "curves": {
+            "threshold": grid.tolist(),
+            **{name: np.round(values, 4).tolist() for name, values in curves.items()},
+        },
+    }
+
+    print(f"{'threshold':>9} {'accuracy':>9} {'escalated':>10} {'unknown':>8}")
+    for t in np.round(np.arange(0.0, 1.0001, 0.05), 2):
+        i = idx[float(t)]
+        print(f"{t:9.2f} {curves['accuracy'][i]:9.2%} {curves['escalation_rate'][i]:10.2%} {curves['unknown_rate'][i]:8.2%}")
+    for name in ("current", "global", "per_label"):
+        r = report[name]
+        print(f"{name:<10} accuracy {r['accuracy']:.2%}  escalated {r['escalation_rate']:.2%}  unknown {r['unknown_rate']:.2%}")
+    print("label thresholds: " + ", ".join(f"{k}={v:.2f}" for k, v in report["per_label"]["label_thresholds"].items()))
+
+    if out_path:
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        with open(out_path, "w") as f:
+            json.dump({
+                "model": report["model"],
+                "threshold": global_threshold,
+                "label_thresholds": report["per_label"]["label_thresholds"],
+            }, f, indent=2)
+        print(f"Wrote thresholds to {out_path}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def peak_rss_mb():
+    # Peak RSS of this process in MB (also used by the bench scripts). The resource
+    # module is Unix-only; no peak RSS is reported on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_tier(tier: str) -> dict:
+    """Classify + extract every document with this process's tier (set via DOCINTEL_MODEL_TIER)."""
+    from app.classify import ai_classifier
+    from app.extract import ai_extractor
+    from app.ingest.ingest import _extract_fields
+
+    # Every document must actually run the models, including the warmup one
+    result_cache.RESULT_CACHE_ENABLED = False
+    corpus = load_corpus(DATASET_DIR)
+    items = [(doc["path"], doc["label"]) for doc in corpus]
+    texts = [doc["text"] for doc in corpus]
+
+    t0 = time.perf_counter()
+    ai_classifier._get_pipe()
+    ai_extractor._get_qa_pipe()
+    load_seconds = time.perf_counter() - t0
+    # Warm up so the first document is not charged for lazy initialization
+    _extract_fields(classify_text(texts[0]), texts[0])
+
+    classify_times, extract_times, correct = [], [], 0
+    for (_, true_label), text in zip(items, texts):
+        t0 = time.perf_counter()
+        predicted = classify_text(text)
+        t1 = time.perf_counter()
+        _extract_fields(predicted, text)
+        t2 = time.perf_counter()
+        classify_times.append(t1 - t0)
+        extract_times.append(t2 - t1)
+        correct += predicted == true_label
+
+    return {
+        "tier": tier,
+        "classifier": ai_classifier._MODEL_NAME,
+        "qa": ai_extractor._MODEL_QA,
+        "documents": len(items),
+        "accuracy": correct / len(items),
+        "load_seconds": load_seconds,
+        "classify_seconds": classify_times,
+        "extract_seconds": extract_times,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def benchmark_tiers(tiers, json_path=None):
+    # One process per tier so peak RSS and model caches are not shared between tiers
+    reports = []
+    out_dir = tempfile.mkdtemp(prefix="docintel-tiers-")
+    for tier in tiers:
+        out_path = os.path.join(out_dir, f"{tier}.json")
+        env = dict(os.environ, DOCINTEL_MODEL_TIER=tier, DOCINTEL_AI="1", DOCINTEL_FAST_TIER="0")
+        env.pop("DOCINTEL_CLASSIFIER_MODEL", None)
+        env.pop("DOCINTEL_QA_MODEL", None)
+        print(f"benchmarking tier {tier} ...")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--tier-run", tier, "--tier-out", out_path],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"tier {tier} failed:\n{proc.stderr[-2000:]}")
+            continue
+        with open(out_path) as f:
+            reports.append(json.load(f))
+
+    print(f"\n{'tier':<10} {'accuracy':>8} {'load s':>7} {'classify p50/p95 ms':>20} "
+          f"{'extract p50/p95 ms':>19} {'total p50/p95 ms':>17} {'peak RSS MB':>11}")
+    for r in reports:
+        totals = [c + e for c, e in zip(r["classify_seconds"], r["extract_seconds"])]
+        row = {
+            "tier": r["tier"], "classifier": r["classifier"], "qa": r["qa"],
+            "accuracy": round(r["accuracy"], 4), "load_seconds": round(r["load_seconds"], 2),
+            "peak_rss_mb": round(r["peak_rss_mb"]) if r["peak_rss_mb"] is not None else "-",
+        }
+        for name, values in (("classify", r["classify_seconds"]), ("extract", r["extract_seconds"]), ("total", totals)):
+            row[f"{name}_p50_ms"] = round(_percentile(values, 50) * 1000, 1)
+            row[f"{name}_p95_ms"] = round(_percentile(values, 95) * 1000, 1)
+        print(f"{row['tier']:<10} {row['accuracy']:8.2%} {row['load_seconds']:7.2f} "
+              f"{row['classify_p50_ms']:>9.1f}/{row['classify_p95_ms']:<10.1f} "
+              f"{row['extract_p50_ms']:>9.1f}/{row['extract_p95_ms']:<9.1f} "
+              f"{row['total_p50_ms']:>8.1f}/{row['total_p95_ms']:<8.1f} {row['peak_rss_mb']:>11}")
+        print(f"{'':<10} classifier={row['classifier']} qa={row['qa']}")
+        r.update(row)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump([{k: v for k, v in r.items() if not k.endswith("_seconds") or k == "load_seconds"}
+                       for r in reports], f, indent=2)
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Evaluate the document classifier on the provided dataset.")
+    parser.add_argument("--tiers", nargs="*", default=None,
+                        help="Benchmark these model tiers (all configured tiers if none given)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for text extraction")
+    parser.add_argument("--refresh", action="store_true", help="Re-extract text instead of using the corpus cache")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Sweep zero-shot thresholds over cached score vectors and write the best ones")
+    parser.add_argument("--thresholds-out", default=THRESHOLDS_PATH,
+                        help="Where --calibrate writes thresholds (read by classify_text)")
+    parser.add_argument("--tier-run", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--tier-out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tier_run:
+        report = run_tier(args.tier_run)
+        with open(args.tier_out, "w") as f:
+            json.dump(report, f)
+    elif args.calibrate:
+        calibrate(load_corpus(DATASET_DIR, workers=args.workers), args.json_path, args.thresholds_out)
+    elif args.tiers is not None:
+        from app.inference.tiers import MODEL_TIERS
+        benchmark_tiers(args.tiers or list(MODEL_TIERS), args.json_path)
+    else:
+        main(workers=args.workers, json_path=args.json_path, refresh=args.refresh)
@@ -1,6 +1,9 @@
 import axios from 'axios'
 
 const BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'
+const POLL_INTERVAL_MS = 1000
+// Give up on a job that has not finished after this long
+const JOB_TIMEOUT_MS = 10 * 60 * 1000
 
 export const api = {
   async upload(file: File): Promise<{ document_id: string }> {
@@ -9,13 +12,38 @@ export const api = {
     const res = await axios.post(`${BASE_URL}/upload`, form, {
       headers: { 'Content-Type': 'multipart/form-data' },
     })
+    // Upload is processed in the background; wait for the job to finish
+    const job = await api.waitForJob(res.data.job_id)
+    return { document_id: job.document_id }
+  },
+
+  async uploadBatch(files: File[]) {
+    const form = new FormData()
+    files.forEach((file) => form.append('files', file))
+    const res = await axios.post(`${BASE_URL}/upload/batch`, form, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    })
+    return res.data
+  },
+
+  async getJob(id: string) {
+    const res = await axios.get(`${BASE_URL}/jobs/${id}`)
     return res.data
   },
 
+  async waitForJob(id: string, timeoutMs: number = JOB_TIMEOUT_MS) {
+    const deadline = Date.now() + timeoutMs
+    while (Date.now() < deadline) {
+      const job = await api.getJob(id)
+      if (job.state === 'done') return job
+      if (job.state === 'failed') throw new Error(job.error || 'Processing failed')
+      await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS))
+    }
+    throw new Error('Processing is taking too long; please try again later')
+  },
+
   async getDocument(id: string) {
     const res = await axios.get(`${BASE_URL}/document/${id}`)
     return res.data
   },
 }
-
-
@@ -0,0 +1,43 @@
+# scripts/bench_classify_batch.py
+# Zero-shot classification throughput (docs/sec) versus batch size on CPU:
+#   python scripts/bench_classify_batch.py [batch sizes...]
+import os
+import sys
+import time
+from app.classify.ai_classifier import _get_pipe, classify_texts_ai
+from app.inference import result_cache
+from app.ingest.pages import extract_text
+
+DATASET_DIR = "data/provided_dataset"
+BATCH_SIZES = [int(b) for b in sys.argv[1:]] or [1, 2, 4, 8, 16]
+
+# Every batch size must actually run the model
+result_cache.RESULT_CACHE_ENABLED = False
+
+texts = []
+for folder in sorted(os.listdir(DATASET_DIR)):
+    folder_path = os.path.join(DATASET_DIR, folder)
+    if not os.path.isdir(folder_path):
+        continue
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.endswith(".pdf"):
+            texts.append(extract_text(os.path.join(folder_path, filename)))
+
+print(f"{len(texts)} documents")
+
+# Load the model and warm up so the first batch size isn't penalized
+_get_pipe()
+classify_texts_ai(texts[:2], batch_size=2)
+
+baseline = None
+for batch_size in BATCH_SIZES:
+    t0 = time.perf_counter()
+    if batch_size == 1:
+        # The pre-batching path: one pipeline call per document
+        labels = [classify_texts_ai([t], batch_size=1)[0][0] for t in texts]
+    else:
+        labels = [r[0] for r in classify_texts_ai(texts, batch_size=batch_size)]
+    elapsed = time.perf_counter() - t0
+    docs_per_sec = len(texts) / elapsed
+    baseline = baseline or docs_per_sec
+    print(f"batch_size={batch_size:>3}: {elapsed:6.2f}s  {docs_per_sec:6.2f} docs/sec  ({docs_per_sec / baseline:.2f}x)")
@@ -0,0 +1,143 @@
+# scripts/bench_inference_backends.py
+# Accuracy parity and latency/memory of the inference backends (DOCINTEL_INFERENCE_BACKEND)
+# on the labelled dataset: zero-shot classification plus the QA field extractors.
+# Each backend runs in its own process so peak RSS is measured separately:
+#   python scripts/bench_inference_backends.py [--backends torch torch-int8 onnx-int8] [--limit N]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def run_backend(backend: str, limit: int, classifier_model: str, qa_model: str) -> dict:
+    # Child process: everything measured here belongs to this backend only
+    os.environ["DOCINTEL_AI"] = "1"
+    from app.classify import ai_classifier
+    from app.classify.fast_classifier import iter_dataset
+    from app.extract import ai_extractor
+    from app.inference import backends, result_cache
+    from app.ingest.pages import extract_text
+    from evaluate_classifier import peak_rss_mb
+
+    backends.INFERENCE_BACKEND = backend
+    # Every document must actually run the models, including the warmup one
+    result_cache.RESULT_CACHE_ENABLED = False
+    if classifier_model:
+        ai_classifier._MODEL_NAME = classifier_model
+    if qa_model:
+        ai_extractor._MODEL_QA = qa_model
+    extractors = {
+        "capital_call_letter": ai_extractor.ai_extract_capital_call_fields,
+        "distribution_notice": ai_extractor.ai_extract_distribution_fields,
+        "valuation_reports": ai_extractor.ai_extract_valuation_fields,
+        "quarterly_update": ai_extractor.ai_extract_quarterly_fields,
+    }
+    items = list(iter_dataset())[:limit] if limit else list(iter_dataset())
+    texts = [extract_text(path) for path, _ in items]
+
+    t0 = time.perf_counter()
+    ai_classifier._get_pipe()
+    ai_extractor._get_qa_pipe()
+    load_seconds = time.perf_counter() - t0
+
+    # Warm up so the first document is not charged for lazy initialization
+    ai_classifier.classify_texts_ai(texts[:1], batch_size=1)
+    extractors[items[0][1]](texts[0])
+
+    classify_times, qa_times, labels, scores, fields = [], [], [], [], []
+    for (_, label), text in zip(items, texts):
+        t0 = time.perf_counter()
+        predicted, _, score_dict = ai_classifier.classify_texts_ai([text], batch_size=1)[0]
+        classify_times.append(time.perf_counter() - t0)
+        labels.append(predicted)
+        scores.append(score_dict)
+        t0 = time.perf_counter()
+        # Fields are extracted for the true label so QA parity does not depend on classification
+        fields.append(extractors[label](text)[0])
+        qa_times.append(time.perf_counter() - t0)
+
+    return {
+        "backend": backend,
+        "documents": len(items),
+        "truth": [label for _, label in items],
+        "labels": labels,
+        "scores": scores,
+        "fields": json.loads(json.dumps(fields, default=str)),
+        "load_seconds": load_seconds,
+        "classify_seconds": classify_times,
+        "qa_seconds": qa_times,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _mb(value) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx-int8"])
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N documents")
+    parser.add_argument("--classifier-model", default=None, help="Override the zero-shot model")
+    parser.add_argument("--qa-model", default=None, help="Override the QA model")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Written to a file: model loading and extraction print to stdout
+        with open(args.child_out, "w") as f:
+            json.dump(run_backend(args.child, args.limit, args.classifier_model, args.qa_model), f)
+        return
+
+    results = {}
+    out_dir = tempfile.mkdtemp(prefix="docintel-bench-")
+    for backend in args.backends:
+        out_path = os.path.join(out_dir, f"{backend}.json")
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", backend, "--child-out", out_path,
+               "--limit", str(args.limit)]
+        if args.classifier_model:
+            cmd += ["--classifier-model", args.classifier_model]
+        if args.qa_model:
+            cmd += ["--qa-model", args.qa_model]
+        print(f"running {backend} ...", file=sys.stderr)
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{backend} failed:\n{proc.stderr[-2000:]}", file=sys.stderr)
+            continue
+        with open(out_path) as f:
+            results[backend] = json.load(f)
+
+    reference = results.get("torch")
+    print(f"\n{'backend':<11} {'load s':>7} {'classify p50 ms':>16} {'QA p50 ms':>10} {'peak RSS MB':>12}"
+          f" {'accuracy':>9} {'label parity':>13} {'max score diff':>15} {'field parity':>13}")
+    for backend, r in results.items():
+        n = r["documents"]
+        accuracy = sum(p == t for p, t in zip(r["labels"], r["truth"])) / n
+        line = (f"{backend:<11} {r['load_seconds']:7.2f} {_median(r['classify_seconds']) * 1000:16.1f}"
+                f" {_median(r['qa_seconds']) * 1000:10.1f} {_mb(r['peak_rss_mb']):>12} {accuracy:9.1%}")
+        if reference and backend != "torch":
+            label_parity = sum(a == b for a, b in zip(r["labels"], reference["labels"])) / n
+            score_diff = max(
+                (abs(s[k] - ref[k]) for s, ref in zip(r["scores"], reference["scores"]) for k in ref if k in s),
+                default=0.0,
+            )
+            field_pairs = [(f.get(k), ref.get(k)) for f, ref in zip(r["fields"], reference["fields"]) for k in ref]
+            field_parity = sum(a == b for a, b in field_pairs) / len(field_pairs) if field_pairs else 1.0
+            line += f" {label_parity:13.1%} {score_diff:15.4f} {field_parity:13.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# scripts/bench_inference_workers.py
+# Model inference inside the API process versus in DOCINTEL_INFERENCE_WORKERS worker
+# processes: document throughput, how late a request-handling thread gets scheduled while
+# extraction runs (GIL contention), and the API process's peak RSS. Each configuration
+# runs in its own process:
+#   python scripts/bench_inference_workers.py [--workers 0 2] [--concurrency 4] [--limit N]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+TICK_SECONDS = 0.005
+
+
+def run_config(concurrency: int, limit: int) -> dict:
+    # Child process; DOCINTEL_INFERENCE_WORKERS was set by the parent
+    from app.classify import ai_classifier
+    from app.classify.fast_classifier import iter_dataset
+    from app.extract import ai_extractor
+    from app.inference import result_cache, workers
+    from app.ingest.pages import extract_text
+    from evaluate_classifier import peak_rss_mb
+
+    extractors = {
+        "capital_call_letter": ai_extractor.ai_extract_capital_call_fields,
+        "distribution_notice": ai_extractor.ai_extract_distribution_fields,
+        "valuation_reports": ai_extractor.ai_extract_valuation_fields,
+        "quarterly_update": ai_extractor.ai_extract_quarterly_fields,
+    }
+    # Every document must actually run the models
+    result_cache.RESULT_CACHE_ENABLED = False
+    items = list(iter_dataset())[:limit] if limit else list(iter_dataset())
+    docs = [(extract_text(path), label) for path, label in items]
+
+    def process(doc):
+        text, label = doc
+        ai_classifier.classify_text_ai(text)
+        return extractors[label](text)[0]
+
+    t0 = time.perf_counter()
+    if workers.enabled():
+        workers.warm()
+    process(docs[0])
+    load_seconds = time.perf_counter() - t0
+
+    # Stand-in for request handling: a thread that wants to run every TICK_SECONDS
+    lags, done = [], threading.Event()
+
+    def heartbeat():
+        while not done.is_set():
+            due = time.perf_counter() + TICK_SECONDS
+            time.sleep(TICK_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - due))
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(process, docs))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    beat.join()
+    workers.shutdown()
+
+    lags.sort()
+    return {
+        "workers": workers.INFERENCE_WORKERS,
+        "documents": len(docs),
+        "load_seconds": load_seconds,
+        "seconds": elapsed,
+        "lag_p50_ms": lags[len(lags) // 2] * 1000 if lags else 0.0,
+        "lag_p99_ms": lags[min(len(lags) - 1, int(0.99 * len(lags)))] * 1000 if lags else 0.0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+        # Worker processes are not included
+        "api_peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", nargs="+", type=int, default=[0, 2])
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents processed at once")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N documents")
+    parser.add_argument("--child-out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_out:
+        # Written to a file: model loading and extraction print to stdout
+        with open(args.child_out, "w") as f:
+            json.dump(run_config(args.concurrency, args.limit), f)
+        return
+
+    out_dir = tempfile.mkdtemp(prefix="docintel-bench-")
+    print(f"{'workers':>7} {'load s':>7} {'docs/s':>7} {'lag p50 ms':>11} {'lag p99 ms':>11}"
+          f" {'lag max ms':>11} {'API RSS MB':>11}")
+    for n in args.workers:
+        out_path = os.path.join(out_dir, f"{n}.json")
+        env = dict(os.environ, DOCINTEL_AI="1", DOCINTEL_INFERENCE_WORKERS=str(n), DOCINTEL_PRELOAD_MODELS="1")
+        cmd = [sys.executable, os.path.abspath(__file__), "--child-out", out_path,
+               "--concurrency", str(args.concurrency), "--limit", str(args.limit)]
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{n} workers failed:\n{proc.stderr[-2000:]}", file=sys.stderr)
+            continue
+        with open(out_path) as f:
+            r = json.load(f)
+        rss = "-" if r["api_peak_rss_mb"] is None else f"{r['api_peak_rss_mb']:.0f}"
+        print(f"{r['workers']:>7} {r['load_seconds']:>7.1f} {r['documents'] / r['seconds']:>7.2f}"
+              f" {r['lag_p50_ms']:>11.2f} {r['lag_p99_ms']:>11.2f} {r['lag_max_ms']:>11.2f}"
+              f" {rss:>11}")
+
+
+if __name__ == "__main__":
+    main()
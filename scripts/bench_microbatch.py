@@ -0,0 +1,55 @@
+# scripts/bench_microbatch.py
+# Throughput of concurrent document extraction (classification + QA) with the
+# cross-request micro-batching scheduler on and off:
+#   python scripts/bench_microbatch.py [concurrency...]
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["DOCINTEL_AI"] = "1"
+from app.classify import ai_classifier
+from app.classify.fast_classifier import iter_dataset
+from app.extract import ai_extractor
+from app.inference import result_cache, scheduler
+from app.ingest.pages import extract_text
+
+CONCURRENCY = [int(c) for c in sys.argv[1:]] or [1, 4, 8]
+EXTRACTORS = {
+    "capital_call_letter": ai_extractor.ai_extract_capital_call_fields,
+    "distribution_notice": ai_extractor.ai_extract_distribution_fields,
+    "valuation_reports": ai_extractor.ai_extract_valuation_fields,
+    "quarterly_update": ai_extractor.ai_extract_quarterly_fields,
+}
+
+# Every configuration must actually run the model
+result_cache.RESULT_CACHE_ENABLED = False
+
+items = [(extract_text(path), label) for path, label in iter_dataset()]
+print(f"{len(items)} documents")
+
+
+def process(item):
+    # What one ingest does with the models: classify, then extract the fields
+    text, doc_type = item
+    ai_classifier.classify_text_ai(text)
+    return EXTRACTORS[doc_type](text)[0]
+
+
+# Load both models and warm up so the first configuration isn't penalized
+process(items[0])
+
+for enabled in (False, True):
+    scheduler.MICROBATCH_ENABLED = enabled
+    for workers in CONCURRENCY:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(process, items))
+        elapsed = time.perf_counter() - t0
+        label = f"{'micro-batched' if enabled else 'direct'}, {workers} concurrent"
+        print(f"{label:>28}: {elapsed:6.2f}s  {len(items) / elapsed:6.2f} docs/s")
+
+for name, s in scheduler.stats().items():
+    if isinstance(s, dict):
+        print(f"{name}: {s['batches']} batches, avg size {s['avg_batch_size']}, max {s['max_batch_size']}, "
+              f"max queue depth {s['max_queue_depth']}, avg wait {s['avg_wait_ms']} ms")
@@ -0,0 +1,74 @@
+# scripts/bench_qa_batch.py
+# Per-document QA extraction latency: one pipeline call per question (the previous
+# behaviour) versus all of a document's questions in one batched pipeline call, and versus
+# the shared-context path that tokenizes each document's context once:
+#   python scripts/bench_qa_batch.py [batch sizes...]
+import os
+import sys
+import time
+
+os.environ["DOCINTEL_AI"] = "1"
+from app.classify.fast_classifier import iter_dataset
+from app.extract import ai_extractor
+from app.inference import result_cache
+from app.ingest.pages import extract_text
+
+BATCH_SIZES = [int(b) for b in sys.argv[1:]] or [4, 8, 16]
+EXTRACTORS = {
+    "capital_call_letter": ai_extractor.ai_extract_capital_call_fields,
+    "distribution_notice": ai_extractor.ai_extract_distribution_fields,
+    "valuation_reports": ai_extractor.ai_extract_valuation_fields,
+    "quarterly_update": ai_extractor.ai_extract_quarterly_fields,
+}
+
+# Every configuration must actually run the model
+result_cache.RESULT_CACHE_ENABLED = False
+
+items = [(extract_text(path), label) for path, label in iter_dataset()]
+print(f"{len(items)} documents")
+
+
+def sequential_ask_pairs(pairs, debug=None):
+    # The pre-batching path: one pipeline call per question
+    qa = ai_extractor._get_qa_pipe()
+    answers = []
+    for q, context in pairs:
+        try:
+            answers.append(qa(question=q, context=context))
+        except Exception as e:
+            answers.append(e)
+    return answers
+
+
+def run(label):
+    times, outputs, saved_ms = [], [], 0.0
+    for text, doc_type in items:
+        t0 = time.perf_counter()
+        results, _, raw = EXTRACTORS[doc_type](text)
+        times.append(time.perf_counter() - t0)
+        outputs.append(results)
+        saved_ms += raw.get("_qa", {}).get("encode_saved_ms", 0.0)
+    times.sort()
+    p50, p95 = times[len(times) // 2], times[min(len(times) - 1, int(0.95 * len(times)))]
+    print(f"{label:>22}: p50 {p50 * 1000:8.1f} ms/doc  p95 {p95 * 1000:8.1f} ms/doc  total {sum(times):6.2f}s")
+    if saved_ms:
+        print(f"{'':>22}  context tokenization saved: {saved_ms:.1f} ms total")
+    return outputs
+
+
+# Load the model and warm up so the first configuration isn't penalized
+ai_extractor._get_qa_pipe()
+EXTRACTORS[items[0][1]](items[0][0])
+
+batched_ask_pairs = ai_extractor._ask_pairs
+ai_extractor._ask_pairs = sequential_ask_pairs
+baseline = run("one call per question")
+ai_extractor._ask_pairs = batched_ask_pairs
+
+for shared in (False, True):
+    ai_extractor.QA_SHARED_CONTEXT = shared
+    for batch_size in BATCH_SIZES:
+        ai_extractor.QA_BATCH_SIZE = batch_size
+        outputs = run(f"{'shared' if shared else 'batched'}, batch_size={batch_size}")
+        same = sum(a == b for a, b in zip(outputs, baseline))
+        print(f"{'':>22}  same fields as baseline: {same}/{len(items)} documents")
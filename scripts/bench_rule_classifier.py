@@ -0,0 +1,62 @@
+# scripts/bench_rule_classifier.py
+# Rules classifier on large texts: the Aho-Corasick matcher and the per-keyword fallback
+# versus the original scoring loop, each row labelled by the matcher that actually ran,
+# with a label parity check over the dataset:
+#   python scripts/bench_rule_classifier.py [pages]
+import sys
+import time
+from app.classify import classifier
+from app.classify.classifier import DOC_TYPES, classify_text_rule
+from app.classify.fast_classifier import iter_dataset
+from app.ingest.pages import extract_text
+
+PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+CHARS_PER_PAGE = 3000
+ROUNDS = 20
+
+
+def classify_text_rule_scan(text: str) -> str:
+    # The pre-compiled-matcher implementation, kept here as the baseline
+    lowered = text.lower()
+    scores = {doc_type: 0 for doc_type in DOC_TYPES}
+    for doc_type, keywords in DOC_TYPES.items():
+        for kw in keywords:
+            if kw in lowered:
+                scores[doc_type] += 1
+    best_type = max(scores, key=scores.get)
+    return best_type if scores[best_type] > 0 else "unknown"
+
+
+def _use_matcher(fallback: bool) -> str:
+    # Rebuild the matcher, hiding pyahocorasick to force the fallback; returns the backend in use
+    if fallback:
+        sys.modules["ahocorasick"] = None
+    else:
+        sys.modules.pop("ahocorasick", None)
+    classifier._rule_matcher = None
+    return classifier.rule_backend()
+
+
+texts = [extract_text(path) for path, _ in iter_dataset()]
+# Large inputs: each dataset text repeated/truncated to PAGES pages
+target = PAGES * CHARS_PER_PAGE
+large = [(t * (target // max(len(t), 1) + 1))[:target] for t in texts if t]
+
+rows = [("baseline scan", classify_text_rule_scan, True)]
+# Without pyahocorasick both classify_text_rule rows would run the fallback; bench it once
+if _use_matcher(False) == "aho-corasick":
+    rows.append(("classifier", classify_text_rule, False))
+rows.append(("classifier", classify_text_rule, True))
+
+for name, fn, fallback in rows:
+    backend = _use_matcher(fallback)
+    if fn is classify_text_rule:
+        name = f"{name} ({backend})"
+    mismatches = sum(fn(t) != classify_text_rule_scan(t) for t in texts)
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        for t in large:
+            fn(t)
+    per_doc = (time.perf_counter() - t0) / (ROUNDS * len(large))
+    print(f"{name:>31}: {per_doc * 1000:8.3f} ms/doc  ({PAGES} pages, {target} chars)"
+          f"  parity {len(texts) - mismatches}/{len(texts)}")
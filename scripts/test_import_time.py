@@ -0,0 +1,53 @@
+# scripts/test_import_time.py
+# Import-time budget for rules-only startup (DOCINTEL_AI=0). Fails (exit 1) if importing
+# the API or CLI modules takes longer than the budget or pulls in the ML stack:
+#   python scripts/test_import_time.py [budget_seconds]
+import os
+import subprocess
+import sys
+
+BUDGET_SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 1.5
+MODULES = ["app.api.api", "app.ingest.bulk", "app.classify.classifier", "app.ingest.ingest"]
+# Must only be imported once a model is actually used
+FORBIDDEN = ("torch", "transformers", "sklearn")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module: str) -> dict:
+    """{module name: cumulative import microseconds} from a fresh interpreter's -X importtime."""
+    env = dict(os.environ, DOCINTEL_AI="0", PYTHONPATH=REPO_ROOT)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"importing {module} failed:\n{proc.stderr}")
+    profile = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+failures = []
+for module in MODULES:
+    profile = import_profile(module)
+    seconds = profile[module] / 1e6
+    heavy = sorted({name.split(".")[0] for name in profile} & set(FORBIDDEN))
+    slowest = sorted(
+        ((us, name) for name, us in profile.items() if "." not in name and name != module), reverse=True
+    )[:3]
+    print(f"{module:<26} {seconds:6.3f}s  slowest: " + ", ".join(f"{n} {us / 1e6:.3f}s" for us, n in slowest))
+    if seconds > BUDGET_SECONDS:
+        failures.append(f"{module} took {seconds:.3f}s (budget {BUDGET_SECONDS:.3f}s)")
+    if heavy:
+        failures.append(f"{module} imports {', '.join(heavy)} in rules-only mode")
+
+if failures:
+    print("\nFAILED:\n  " + "\n  ".join(failures))
+    sys.exit(1)
+print(f"\nOK: all imports within {BUDGET_SECONDS:.3f}s without {', '.join(FORBIDDEN)}")
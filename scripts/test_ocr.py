@@ -0,0 +1,34 @@
+# scripts/test_ocr.py
+# OCR every page of a PDF as if it were scanned (needs only the tesseract binary):
+#   python scripts/test_ocr.py data/Sample-Capital-Call.pdf
+import sys
+import time
+from app.ingest.ocr import ocr_available, ocr_pages
+import pdfplumber
+
+PDF = sys.argv[1] if len(sys.argv) > 1 else "data/Sample-Capital-Call.pdf"
+
+
+# OCR runs in spawned worker processes, which re-import this script
+def main():
+    if not ocr_available():
+        sys.exit("tesseract not found on PATH")
+
+    with pdfplumber.open(PDF) as pdf:
+        page_count = len(pdf.pages)
+
+    t0 = time.perf_counter()
+    texts = ocr_pages(PDF, range(page_count))
+    print(f"First run: {page_count} pages in {time.perf_counter() - t0:.2f}s")
+
+    t0 = time.perf_counter()
+    ocr_pages(PDF, range(page_count))
+    print(f"Second run (cached): {time.perf_counter() - t0:.2f}s")
+
+    for i in sorted(texts):
+        print(f"\n--- page {i + 1} ---")
+        print(texts[i][:300])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# scripts/test_ocr_page_hash.py
+# OCR cache keys for pages whose /Contents is an array of stream references (no tesseract needed):
+#   python scripts/test_ocr_page_hash.py [data/sample_dist_notice_1.pdf]
+import sys
+
+import pdfplumber
+from pdfminer.pdftypes import PDFObjRef, resolve1
+
+from app.ingest.ocr import page_hash
+
+PDF = sys.argv[1] if len(sys.argv) > 1 else "data/sample_dist_notice_1.pdf"
+
+with pdfplumber.open(PDF) as pdf:
+    page = pdf.pages[0]
+    contents = resolve1(page.page_obj.contents) or []
+    if not any(isinstance(s, PDFObjRef) for s in contents):
+        sys.exit(f"{PDF} page 1 does not have a multi-stream /Contents array")
+
+    key = page_hash(page)
+    if not key:
+        sys.exit(f"FAILED: no cache key for page 1 of {PDF}")
+    if page_hash(pdf.pages[0]) != key:
+        sys.exit("FAILED: page hash is not stable")
+
+print(f"OK: page 1 ({len(contents)} content streams) hashed to {key[:16]}...")